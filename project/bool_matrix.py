@@ -0,0 +1,197 @@
+from typing import Tuple, Union
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix
+
+# CSR keeps at least ~5 bytes per nonzero, bitset keeps 1/8 byte per cell
+DENSITY_THRESHOLD = 0.03
+
+# sparse-by-bitset products gather rows of the bitset in chunks of at most this many words
+CHUNK_WORDS = 1 << 20
+
+_WORD = np.dtype("<u8")
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+class BitsetMatrix:
+    """
+    Dense bool matrix with every row packed to little-endian uint64 words.
+    It supports the same operators that engines use on bool csr_matrix:
+    `@` for multiplication, `+` for union, `>` for difference,
+    so both representations can be mixed in one expression.
+    Sparse operands are never packed to bitsets: difference keeps representation of its left side,
+    products with sparse matrix are computed from its nonzeros or over CSR form of the bitset.
+    """
+
+    def __init__(self, words: np.ndarray, n_cols: int):
+        self.words: np.ndarray = words
+        self.shape: Tuple[int, int] = (words.shape[0], n_cols)
+
+    @staticmethod
+    def zeros(shape: Tuple[int, int]) -> "BitsetMatrix":
+        """
+        Create empty matrix of given shape
+        """
+        n_words = (shape[1] + 63) // 64
+        return BitsetMatrix(np.zeros((shape[0], n_words), dtype=_WORD), shape[1])
+
+    @staticmethod
+    def from_csr(matrix: csr_matrix) -> "BitsetMatrix":
+        """
+        Pack bool sparse matrix to bitset
+        """
+        res = BitsetMatrix.zeros(matrix.shape)
+        rows, cols = matrix.nonzero()
+        np.bitwise_or.at(
+            res.words.view(np.uint8), (rows, cols >> 3), np.uint8(1) << (cols & 7)
+        )
+        return res
+
+    def tocsr(self) -> csr_matrix:
+        """
+        Convert to bool csr_matrix
+        """
+        rows, cols = self.nonzero()
+        data = np.ones(len(rows), dtype=np.bool_)
+        return coo_matrix(
+            (data, (rows, cols)), shape=self.shape, dtype=np.bool_
+        ).tocsr()
+
+    def toarray(self) -> np.ndarray:
+        """
+        Convert to dense bool ndarray
+        """
+        bits = np.unpackbits(self.words.view(np.uint8), axis=1, bitorder="little")
+        return bits[:, : self.shape[1]].astype(np.bool_)
+
+    def copy(self) -> "BitsetMatrix":
+        return BitsetMatrix(self.words.copy(), self.shape[1])
+
+    @property
+    def nnz(self) -> int:
+        return int(_POPCOUNT[self.words.view(np.uint8)].sum())
+
+    def count_nonzero(self) -> int:
+        return self.nnz
+
+    def nonzero(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.toarray().nonzero()
+
+    def __add__(self, other) -> "BitsetMatrix":
+        return BitsetMatrix(self.words | _to_words(other), self.shape[1])
+
+    __radd__ = __add__
+    __or__ = __add__
+    __ror__ = __add__
+
+    def __iadd__(self, other) -> "BitsetMatrix":
+        self.words |= _to_words(other)
+        return self
+
+    __ior__ = __iadd__
+
+    def multiply(self, other) -> "BitsetMatrix":
+        return BitsetMatrix(self.words & _to_words(other), self.shape[1])
+
+    __and__ = multiply
+    __rand__ = multiply
+
+    def has(self, rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """
+        Get bool vector of whether (rows[k], cols[k]) entries are set
+        """
+        cells = self.words.view(np.uint8)[rows, cols >> 3]
+        return ((cells >> (cols & 7).astype(np.uint8)) & 1).astype(np.bool_)
+
+    def __gt__(self, other) -> "BitsetMatrix":
+        if isinstance(other, BitsetMatrix):
+            return BitsetMatrix(self.words & ~other.words, self.shape[1])
+        res = self.copy()
+        rows, cols = csr_matrix(other).nonzero()
+        np.bitwise_and.at(
+            res.words.view(np.uint8),
+            (rows, cols >> 3),
+            ~(np.uint8(1) << (cols & 7).astype(np.uint8)),
+        )
+        return res
+
+    def __lt__(self, other) -> Union[csr_matrix, "BitsetMatrix"]:
+        # reflected `other > self`, result has representation of other
+        if isinstance(other, BitsetMatrix):
+            return BitsetMatrix(other.words & ~self.words, self.shape[1])
+        other = csr_matrix(other)
+        rows, cols = other.nonzero()
+        keep = ~self.has(rows, cols)
+        data = np.ones(np.count_nonzero(keep), dtype=np.bool_)
+        return coo_matrix(
+            (data, (rows[keep], cols[keep])), shape=other.shape, dtype=np.bool_
+        ).tocsr()
+
+    def __matmul__(self, other) -> Union[csr_matrix, "BitsetMatrix"]:
+        if isinstance(other, BitsetMatrix):
+            return _matmul(self, other)
+        return self.tocsr() @ csr_matrix(other)
+
+    def __rmatmul__(self, other) -> "BitsetMatrix":
+        if isinstance(other, BitsetMatrix):
+            return _matmul(other, self)
+        return _sparse_matmul(csr_matrix(other), self)
+
+
+def _to_bitset(matrix) -> BitsetMatrix:
+    if isinstance(matrix, BitsetMatrix):
+        return matrix
+    return BitsetMatrix.from_csr(csr_matrix(matrix))
+
+
+def _to_words(matrix) -> np.ndarray:
+    return _to_bitset(matrix).words
+
+
+def _matmul(lhs: BitsetMatrix, rhs: BitsetMatrix) -> BitsetMatrix:
+    """
+    Method of Four Russians: rows of rhs are grouped by 8,
+    all 256 unions of every group are precomputed and selected by bytes of lhs rows.
+    """
+    res = BitsetMatrix.zeros((lhs.shape[0], rhs.shape[1]))
+    lhs_bytes = lhs.words.view(np.uint8)
+    n_words = rhs.words.shape[1]
+    for chunk in range((lhs.shape[1] + 7) // 8):
+        rows = rhs.words[chunk * 8 : chunk * 8 + 8]
+        table = np.zeros((256, n_words), dtype=_WORD)
+        for bit, row in enumerate(rows):
+            table[1 << bit : 2 << bit] = table[: 1 << bit] | row
+        res.words |= table[lhs_bytes[:, chunk]]
+    return res
+
+
+def _sparse_matmul(lhs: csr_matrix, rhs: BitsetMatrix) -> BitsetMatrix:
+    """
+    Row i of the product is union of rows k of rhs for nonzero (i, k) of lhs
+    """
+    res = BitsetMatrix.zeros((lhs.shape[0], rhs.shape[1]))
+    rows = np.repeat(np.arange(lhs.shape[0]), np.diff(lhs.indptr))
+    step = max(1, CHUNK_WORDS // max(rhs.words.shape[1], 1))
+    for start in range(0, len(rows), step):
+        chunk = slice(start, start + step)
+        np.bitwise_or.at(res.words, rows[chunk], rhs.words[lhs.indices[chunk]])
+    return res
+
+
+def choose_representation(
+    matrix: Union[csr_matrix, BitsetMatrix],
+    density_threshold: Union[float, None] = None,
+) -> Union[csr_matrix, BitsetMatrix]:
+    """
+    Return matrix as BitsetMatrix if its density is above density_threshold and as csr_matrix otherwise.
+    Matrix is converted back to csr_matrix only if it becomes twice sparser than the threshold.
+    By default, module level DENSITY_THRESHOLD is used.
+    """
+    if density_threshold is None:
+        density_threshold = DENSITY_THRESHOLD
+    n_cells = matrix.shape[0] * matrix.shape[1]
+    if n_cells == 0:
+        return matrix
+    density = matrix.nnz / n_cells
+    if isinstance(matrix, BitsetMatrix):
+        return matrix.tocsr() if density < density_threshold / 2 else matrix
+    return BitsetMatrix.from_csr(matrix) if density >= density_threshold else matrix
@@ -1,38 +1,36 @@
-from typing import Any, Set, Tuple, Union
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Dict, List, Set, Tuple, Union
 import numpy as np
-from pyformlang.cfg import CFG, Terminal, Variable
+from pyformlang.cfg import CFG, Variable
 import networkx as nx
-from scipy.sparse import csr_matrix
-
-from project.context_free_grammar import convert_cfg_to_wcnf, read_cfg_from_file
-
-
-def _is_epsilon_body(body):
-    return len(body) == 0
-
-
-def _is_terminal_body(body, terminal=None):
-    return len(body) == 1 and (terminal is None or Terminal(terminal) in body)
-
-
-def _is_variable_body(body):
-    return len(body) == 2
+from scipy.sparse import csr_matrix, identity, kron
+
+from project.context_free_grammar import (
+    CompiledGrammar,
+    compile_grammar,
+    read_cfg_from_file,
+)
+from project.finite_automata_utils import (
+    build_bool_matrices,
+    build_bool_matrix,
+    get_transitive_closure,
+)
+from project.graph_utils import read_graph
+from project.labeled_graph import LabeledGraph
+from project.rfa import RFA
+from project.semiring import Semiring, get_semiring
 
 
 def _helling_all_result(
-    graph: nx.MultiDiGraph, cfg: CFG
-) -> Set[Tuple[Any, Variable, Any]]:
+    graph: Union[nx.MultiDiGraph, LabeledGraph], grammar: CompiledGrammar
+) -> Set[Tuple[Any, int, Any]]:
     def get_init_r():
         return {
-            (v, prod.head, v)
-            for v in graph.nodes
-            for prod in cfg.productions
-            if _is_epsilon_body(prod.body)
+            (v, head, v) for v in graph.nodes for head in grammar.nullable_heads
         } | {
-            (v, prod.head, u)
+            (v, head, u)
             for v, u, t in graph.edges(data="label")
-            for prod in cfg.productions
-            if _is_terminal_body(prod.body, t)
+            for head in grammar.heads_by_label(t)
         }
 
     r = get_init_r()
@@ -42,27 +40,111 @@ def _helling_all_result(
         r_diff = set()
         for v_2, N_j, u_2 in r:
             if u_2 == v:
-                for prod in cfg.productions:
-                    if prod.body == [N_j, N_i]:
-                        queue.add((v_2, prod.head, u))
-                        r_diff.add((v_2, prod.head, u))
+                for head in grammar.binary_heads.get((N_j, N_i), ()):
+                    r_diff.add((v_2, head, u))
 
         for v_2, N_j, u_2 in r:
             if v_2 == u:
-                for prod in cfg.productions:
-                    if prod.body == [N_i, N_j]:
-                        queue.add((v, prod.head, u_2))
-                        r_diff.add((v, prod.head, u_2))
+                for head in grammar.binary_heads.get((N_i, N_j), ()):
+                    r_diff.add((v, head, u_2))
+        # triples derived before are not queued again, otherwise cycles never end
+        queue |= r_diff - r
         r = r | r_diff
     return r
 
 
-def _prepare_graph_and_cfg(graph: Union[nx.MultiDiGraph, str], cfg: Union[CFG, str]):
+def _helling_indexed_all_result(
+    graph: Union[nx.MultiDiGraph, LabeledGraph], grammar: CompiledGrammar
+) -> Set[Tuple[Any, int, Any]]:
+    r: Set[Tuple[Any, int, Any]] = set()
+    incoming: Dict[Any, Set[Tuple[Any, int]]] = {v: set() for v in graph.nodes}
+    outgoing: Dict[Any, Set[Tuple[int, Any]]] = {v: set() for v in graph.nodes}
+    queue = []
+
+    def add(v, N, u):
+        if (v, N, u) not in r:
+            r.add((v, N, u))
+            incoming[u].add((v, N))
+            outgoing[v].add((N, u))
+            queue.append((v, N, u))
+
+    for v in graph.nodes:
+        for head in grammar.nullable_heads:
+            add(v, head, v)
+    for v, u, t in graph.edges(data="label"):
+        for head in grammar.heads_by_label(t):
+            add(v, head, u)
+
+    binary_heads = grammar.binary_heads
+    while len(queue) > 0:
+        v, N_i, u = queue.pop()
+        for v_2, N_j in list(incoming[v]):
+            for head in binary_heads.get((N_j, N_i), ()):
+                add(v_2, head, u)
+        for N_j, u_2 in list(outgoing[u]):
+            for head in binary_heads.get((N_i, N_j), ()):
+                add(v, head, u_2)
+    return r
+
+
+_HELLING_ENGINES = {
+    "naive": _helling_all_result,
+    "indexed": _helling_indexed_all_result,
+}
+
+
+def _get_engine(engines: Dict[str, Any], engine: str):
+    if engine not in engines:
+        raise ValueError(
+            f"Unknown engine '{engine}', expected one of: {', '.join(engines)}"
+        )
+    return engines[engine]
+
+
+def _graph_label_matrices(
+    graph: Union[nx.MultiDiGraph, LabeledGraph]
+) -> Tuple[List[Any], Dict[Any, csr_matrix]]:
+    """
+    Get list of nodes and bool adjacency matrix of every label
+    """
+    if isinstance(graph, LabeledGraph):
+        return graph.nodes, graph.label_matrices()
+    nodes_list = list(graph.nodes)
+    nodes_idxs = {node: i for i, node in enumerate(nodes_list)}
+    label_matrices = build_bool_matrices(
+        ((nodes_idxs[u], x, nodes_idxs[v]) for u, v, x in graph.edges(data="label")),
+        len(nodes_list),
+    )
+    return nodes_list, label_matrices
+
+
+def _prepare_graph_and_cfg(
+    graph: Union[nx.MultiDiGraph, LabeledGraph, str], cfg: Union[CFG, str]
+):
     if isinstance(cfg, str):
         cfg = read_cfg_from_file(cfg)
     if isinstance(graph, str):
-        graph: nx.MultiDiGraph = nx.nx_pydot.from_pydot(graph)
-    return graph, convert_cfg_to_wcnf(cfg)
+        graph = read_graph(graph)
+    return graph, compile_grammar(cfg)
+
+
+def _prepare_graph_and_rfa(
+    graph: Union[nx.MultiDiGraph, LabeledGraph, str], cfg: Union[CFG, RFA, str]
+):
+    if isinstance(cfg, str):
+        cfg = read_cfg_from_file(cfg)
+    if isinstance(graph, str):
+        graph = read_graph(graph)
+    if isinstance(cfg, RFA):
+        return graph, cfg
+    return graph, RFA.from_cfg(cfg).minimize()
+
+
+def _name_variables(
+    result: Set[Tuple[Any, int, Any]], grammar: CompiledGrammar
+) -> Set[Tuple[Any, Variable, Any]]:
+    variables = grammar.variables
+    return {(v, variables[N], u) for v, N, u in result}
 
 
 def _filter_cfpq_result(
@@ -87,83 +169,304 @@ def _filter_cfpq_result(
 
 
 def helling(
-    graph: Union[nx.MultiDiGraph, str],
+    graph: Union[nx.MultiDiGraph, LabeledGraph, str],
     cfg: Union[CFG, str],
     start_nodes: Union[Set[Any], None] = None,
     final_nodes: Union[Set[Any], None] = None,
     variable: Union[Variable, None] = None,
+    engine: str = "indexed",
 ) -> Set[Tuple[Any, Variable, Any]]:
     """
     Applies the Helling algorithm to a given CFG and graph to find all paths in the graph
     that correspond to a string generated by the CFG.
 
     Args:
-        graph: The graph to traverse.
+        graph: The graph to traverse. It can be a networkx graph, a `LabeledGraph`
+            or a path to a DOT file or a binary graph file, see `graph_utils.read_graph`.
         cfg: The CFG. It can be a `CFG` object or a string path to a file containing the CFG.
         start_nodes: A set of start nodes in the graph. If not provided, all nodes are considered start nodes.
         final_nodes: A set of final nodes in the graph. If not provided, all nodes are considered final nodes.
         variable: The variable to use for generating strings. If not provided, all variables are used.
+        engine: The implementation to use. "indexed" keeps per-node indexes of derived triples and
+            a body -> head index of productions, "naive" rescans all triples for every popped one.
 
     Returns:
         A set of tuples representing paths in the graph that correspond to a string generated
         by the CFG. Each tuple has the form (v, N, u), where v and u are nodes in the graph, and
         N is a variable in the CFG.
     """
-    graph, cfg = _prepare_graph_and_cfg(graph, cfg)
-    result = _helling_all_result(graph, cfg)
+    graph, grammar = _prepare_graph_and_cfg(graph, cfg)
+    result = _get_engine(_HELLING_ENGINES, engine)(graph, grammar)
+    result = _name_variables(result, grammar)
     return _filter_cfpq_result(result, start_nodes, final_nodes, variable)
 
 
+def _init_matrices(
+    graph: Union[nx.MultiDiGraph, LabeledGraph],
+    grammar: CompiledGrammar,
+    semiring: Semiring,
+):
+    nodes_list, label_matrices = _graph_label_matrices(graph)
+    n = len(nodes_list)
+    matrices = [semiring.zeros((n, n)) for _ in grammar.variables]
+    # only matrices of labels used by the grammar are built for LabeledGraph
+    for label in grammar.terminals_idxs:
+        if label not in label_matrices:
+            continue
+        for head in grammar.heads_by_label(label):
+            matrices[head] = semiring.add(
+                matrices[head], semiring.from_bool(label_matrices[label])
+            )
+
+    for head in grammar.nullable_heads:
+        matrices[head] = semiring.add(matrices[head], semiring.identity(n))
+
+    return matrices, nodes_list
+
+
+def _multiply_all(
+    pairs: List[Tuple[Any, Any]], semiring: Semiring, executor: Union[Executor, None]
+) -> List[Any]:
+    """
+    Multiply every (lhs, rhs) pair, on executor workers if it is given.
+    Products are returned in order of pairs, so merging them is deterministic.
+    """
+    if executor is None:
+        return [semiring.matmul(lhs, rhs) for lhs, rhs in pairs]
+    return list(executor.map(lambda pair: semiring.matmul(*pair), pairs))
+
+
+def _matrix_fixpoint(
+    matrices: List[Any],
+    grammar: CompiledGrammar,
+    semiring: Semiring,
+    executor: Union[Executor, None] = None,
+) -> List[Any]:
+    binary_prods = grammar.binary_prods
+    matrices_changed = True
+    while matrices_changed:
+        matrices_changed = False
+        if executor is None:
+            for var, lhs, rhs in binary_prods:
+                facts = semiring.matmul(matrices[lhs], matrices[rhs])
+                new_facts = semiring.improved(facts, matrices[var])
+                if semiring.nnz(new_facts) > 0:
+                    matrices[var] = semiring.add(matrices[var], new_facts)
+                    matrices_changed = True
+            continue
+
+        # all products of a round are computed from matrices of the previous round
+        products = _multiply_all(
+            [(matrices[lhs], matrices[rhs]) for _, lhs, rhs in binary_prods],
+            semiring,
+            executor,
+        )
+        for (var, _, _), facts in zip(binary_prods, products):
+            new_facts = semiring.improved(facts, matrices[var])
+            if semiring.nnz(new_facts) > 0:
+                matrices[var] = semiring.add(matrices[var], new_facts)
+                matrices_changed = True
+
+    return matrices
+
+
+def _semi_naive_matrix_fixpoint(
+    matrices: List[Any],
+    grammar: CompiledGrammar,
+    semiring: Semiring,
+    executor: Union[Executor, None] = None,
+) -> List[Any]:
+    deltas = list(matrices)
+    changed = [var for var, delta in enumerate(deltas) if semiring.nnz(delta) > 0]
+
+    while len(changed) > 0:
+        # only productions using a variable with new facts can derive new facts
+        active_prods = [
+            grammar.binary_prods[i]
+            for i in sorted({i for var in changed for i in grammar.uses[var]})
+        ]
+        pairs = []
+        for _, lhs, rhs in active_prods:
+            pairs.append((deltas[lhs], matrices[rhs]))
+            pairs.append((matrices[lhs], deltas[rhs]))
+        products = _multiply_all(pairs, semiring, executor)
+
+        new_facts = dict()
+        for k, (var, _, _) in enumerate(active_prods):
+            facts = semiring.add(products[2 * k], products[2 * k + 1])
+            if var in new_facts:
+                facts = semiring.add(facts, new_facts[var])
+            new_facts[var] = facts
+
+        deltas = [semiring.zeros(m.shape) for m in matrices]
+        for var, facts in new_facts.items():
+            deltas[var] = semiring.improved(facts, matrices[var])
+            matrices[var] = semiring.add(matrices[var], deltas[var])
+        changed = [var for var in new_facts if semiring.nnz(deltas[var]) > 0]
+
+    return matrices
+
+
+def _matrices_to_result(
+    matrices: List[Any], nodes_list, semiring: Semiring
+) -> Set[Tuple[Any, int, Any]]:
+    return {
+        (nodes_list[i], var, nodes_list[j])
+        for var, m in enumerate(matrices)
+        for i, j in zip(*semiring.nonzero(m))
+    }
+
+
 def _matrix_all_result(
-    graph: nx.MultiDiGraph, cfg: CFG
-) -> Set[Tuple[Any, Variable, Any]]:
+    graph: Union[nx.MultiDiGraph, LabeledGraph],
+    grammar: CompiledGrammar,
+    semiring: Semiring,
+    executor: Union[Executor, None] = None,
+) -> Set[Tuple[Any, int, Any]]:
+    matrices, nodes_list = _init_matrices(graph, grammar, semiring)
+    matrices = _matrix_fixpoint(matrices, grammar, semiring, executor)
+    return _matrices_to_result(matrices, nodes_list, semiring)
 
-    nodes_list = list(graph.nodes)
-    nodes_idxs = {node: i for i, node in enumerate(nodes_list)}
 
-    n = len(graph.nodes)
-    edges = {(nodes_idxs[u], x, nodes_idxs[v]) for u, v, x in graph.edges(data="label")}
-    prods = [(p.head, p.body) for p in cfg.productions]
-    matrices = {v: csr_matrix((n, n), dtype=np.bool_) for v in cfg.variables}
-    for i, x, j in edges:
-        for var, body in prods:
-            if _is_terminal_body(body, x):
-                matrices[var][i, j] = True
+def _matrix_semi_naive_all_result(
+    graph: Union[nx.MultiDiGraph, LabeledGraph],
+    grammar: CompiledGrammar,
+    semiring: Semiring,
+    executor: Union[Executor, None] = None,
+) -> Set[Tuple[Any, int, Any]]:
+    matrices, nodes_list = _init_matrices(graph, grammar, semiring)
+    matrices = _semi_naive_matrix_fixpoint(matrices, grammar, semiring, executor)
+    return _matrices_to_result(matrices, nodes_list, semiring)
 
-    for i in range(n):
-        for var, body in prods:
-            if _is_epsilon_body(body):
-                matrices[var][i, i] = True
 
-    matrices_changed = True
-    while matrices_changed:
-        matrices_changed = False
-        cnt_nonzero = sum(m.count_nonzero() for m in matrices.values())
+_MATRIX_ENGINES = {
+    "naive": _matrix_all_result,
+    "semi_naive": _matrix_semi_naive_all_result,
+}
 
-        for var, body in prods:
-            if _is_variable_body(body):
-                matrices[var] += matrices[body[0]] @ matrices[body[1]]
 
-        matrices_changed = cnt_nonzero != sum(
-            m.count_nonzero() for m in matrices.values()
-        )
+def matrix(
+    graph: Union[nx.MultiDiGraph, LabeledGraph, str],
+    cfg: Union[CFG, str],
+    start_nodes: Union[Set[Any], None] = None,
+    final_nodes: Union[Set[Any], None] = None,
+    variable: Union[Variable, None] = None,
+    engine: str = "semi_naive",
+    backend: Union[str, None] = None,
+    workers: int = 1,
+) -> Set[Tuple[Any, Variable, Any]]:
+    """
+    Applies the matrix algorithm to a given CFG and graph to find all paths in the graph
+    that correspond to a string generated by the CFG.
+
+    Args:
+        graph: The graph to traverse. It can be a networkx graph, a `LabeledGraph`
+            or a path to a DOT file or a binary graph file, see `graph_utils.read_graph`.
+        cfg: The CFG. It can be a `CFG` object or a string path to a file containing the CFG.
+        start_nodes: A set of start nodes in the graph. If not provided, all nodes are considered start nodes.
+        final_nodes: A set of final nodes in the graph. If not provided, all nodes are considered final nodes.
+        variable: The variable to use for generating strings. If not provided, all variables are used.
+        engine: The implementation to use. "semi_naive" multiplies only matrices of facts found
+            on the previous iteration, "naive" multiplies full matrices on every iteration.
+        backend: The backend of boolean semiring for matrix operations, see `project.semiring`.
+        workers: The number of threads computing products of binary productions of one iteration.
+            Products are merged in order of productions, so the result does not depend on it.
 
-    result = {
+    Returns:
+        A set of tuples (v, N, u), where v and u are nodes in the graph, and N is a variable in the CFG.
+    """
+    if workers < 1:
+        raise ValueError(f"Number of workers must be positive, got {workers}")
+    graph, grammar = _prepare_graph_and_cfg(graph, cfg)
+    semiring = get_semiring("boolean", backend)
+    engine_fn = _get_engine(_MATRIX_ENGINES, engine)
+    if workers == 1:
+        result = engine_fn(graph, grammar, semiring)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            result = engine_fn(graph, grammar, semiring, executor)
+    result = _name_variables(result, grammar)
+    return _filter_cfpq_result(result, start_nodes, final_nodes, variable)
+
+
+def _tensor_all_result(
+    graph: Union[nx.MultiDiGraph, LabeledGraph], rfa: RFA
+) -> Set[Tuple[Any, Variable, Any]]:
+    nodes_list, graph_matrices = _graph_label_matrices(graph)
+    n = len(nodes_list)
+
+    rfa_matrices = rfa.to_matrices()
+    variables = list(rfa_matrices.start_states.keys())
+    k = len(rfa_matrices.states_idxs)
+
+    # derivations of variables are kept apart from graph edges, labels may equal their names
+    var_matrices = {var: csr_matrix((n, n), dtype=np.bool_) for var in variables}
+    boxes = {var.value: var for var in variables}
+    for var in variables:
+        if np.any(rfa_matrices.start_states[var] & rfa_matrices.final_states[var]):
+            var_matrices[var] = identity(n, dtype=np.bool_, format="csr")
+
+    def symbol_matrix(symb):
+        if symb.value in boxes:
+            return var_matrices[boxes[symb.value]]
+        return graph_matrices.get(symb.value)
+
+    closure = csr_matrix((k * n, k * n), dtype=np.bool_)
+    graph_changed = True
+    while graph_changed:
+        graph_changed = False
+        product = csr_matrix((k * n, k * n), dtype=np.bool_)
+        for symb, rfa_matrix in rfa_matrices.matrices.items():
+            matrix = symbol_matrix(symb)
+            if matrix is not None:
+                product += kron(rfa_matrix, matrix, format="csr")
+        closure = get_transitive_closure(product, closure)
+
+        rows, cols = closure.nonzero()
+        rfa_rows, graph_rows = np.divmod(rows, n)
+        rfa_cols, graph_cols = np.divmod(cols, n)
+        for var in variables:
+            mask = (
+                rfa_matrices.start_states[var][rfa_rows]
+                & rfa_matrices.final_states[var][rfa_cols]
+            )
+            found = build_bool_matrix(graph_rows[mask], graph_cols[mask], n)
+            new_edges = found > var_matrices[var]
+            if new_edges.nnz > 0:
+                var_matrices[var] = var_matrices[var] + new_edges
+                graph_changed = True
+
+    return {
         (nodes_list[i], var, nodes_list[j])
-        for var, m in matrices.items()
-        for i, j in zip(*m.nonzero())
+        for var in variables
+        for i, j in zip(*var_matrices[var].nonzero())
     }
 
-    return result
-
 
-def matrix(
-    graph: Union[nx.MultiDiGraph, str],
-    cfg: Union[CFG, str],
+def tensor(
+    graph: Union[nx.MultiDiGraph, LabeledGraph, str],
+    cfg: Union[CFG, RFA, str],
     start_nodes: Union[Set[Any], None] = None,
     final_nodes: Union[Set[Any], None] = None,
     variable: Union[Variable, None] = None,
 ) -> Set[Tuple[Any, Variable, Any]]:
-    graph, cfg = _prepare_graph_and_cfg(graph, cfg)
-    result = _matrix_all_result(graph, cfg)
+    """
+    Applies the tensor algorithm to a given CFG and graph to find all paths in the graph
+    that correspond to a string generated by the CFG.
+    The grammar is not converted to WCNF, it is represented as RFA instead.
+
+    Args:
+        graph: The graph to traverse. It can be a networkx graph, a `LabeledGraph`
+            or a path to a DOT file or a binary graph file, see `graph_utils.read_graph`.
+        cfg: The CFG. It can be a `CFG` object, a string path to a file containing the CFG
+            or an already built `RFA`, whose bool decomposition is reused between calls.
+        start_nodes: A set of start nodes in the graph. If not provided, all nodes are considered start nodes.
+        final_nodes: A set of final nodes in the graph. If not provided, all nodes are considered final nodes.
+        variable: The variable to use for generating strings. If not provided, all variables are used.
+
+    Returns:
+        A set of tuples (v, N, u), where v and u are nodes in the graph, and N is a variable in the CFG.
+    """
+    graph, rfa = _prepare_graph_and_rfa(graph, cfg)
+    result = _tensor_all_result(graph, rfa)
     return _filter_cfpq_result(result, start_nodes, final_nodes, variable)
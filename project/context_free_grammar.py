@@ -1,4 +1,292 @@
-from pyformlang.cfg import CFG
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Set, Tuple, Union
+from pyformlang.cfg import CFG, Epsilon, Production, Terminal, Variable
+
+# number of normalized grammars kept by get_wcnf, change it with set_wcnf_cache_size
+WCNF_CACHE_SIZE = 128
+
+# (start symbol value, sorted (head value, ((is terminal, value), ...)) of every production)
+_GrammarKey = Tuple[Any, Tuple[Tuple[Any, Tuple[Tuple[bool, Any], ...]], ...]]
+
+
+class WCNF(NamedTuple):
+    """
+    Grammar in weak Chomsky normal form with variables and terminals numbered by ints.
+    Productions are grouped by body shape: heads of A -> epsilon,
+    (A, a) pairs of A -> a and (A, B, C) triples of A -> B C.
+    Normal forms are shared by cache, so all fields are immutable.
+    """
+
+    start_symbol: Union[Variable, None]
+    variables: Tuple[Variable, ...]
+    terminals: Tuple[Terminal, ...]
+    epsilon_heads: Tuple[int, ...]
+    terminal_prods: Tuple[Tuple[int, int], ...]
+    binary_prods: Tuple[Tuple[int, int, int], ...]
+
+    def to_cfg(self) -> CFG:
+        variables, terminals = self.variables, self.terminals
+        productions = {Production(variables[head], []) for head in self.epsilon_heads}
+        productions.update(
+            Production(variables[head], [terminals[a]])
+            for head, a in self.terminal_prods
+        )
+        productions.update(
+            Production(variables[head], [variables[lhs], variables[rhs]])
+            for head, lhs, rhs in self.binary_prods
+        )
+        return CFG(start_symbol=self.start_symbol, productions=productions)
+
+
+def _grammar_key(cfg: CFG) -> _GrammarKey:
+    """
+    Canonical text of the grammar that does not depend on order of productions
+    """
+    start = None if cfg.start_symbol is None else cfg.start_symbol.value
+    prods = {
+        (
+            prod.head.value,
+            tuple(
+                (isinstance(symbol, Terminal), symbol.value)
+                for symbol in prod.body
+                if not isinstance(symbol, Epsilon)
+            ),
+        )
+        for prod in cfg.productions
+    }
+    return start, tuple(sorted(prods, key=repr))
+
+
+def _closure(edges: List[List[int]], sources: List[int]) -> Set[int]:
+    reached, stack = set(sources), list(sources)
+    while stack:
+        for nxt in edges[stack.pop()]:
+            if nxt not in reached:
+                reached.add(nxt)
+                stack.append(nxt)
+    return reached
+
+
+@lru_cache(maxsize=WCNF_CACHE_SIZE)
+def _normalize_grammar(key: _GrammarKey) -> WCNF:
+    """
+    Same steps as pyformlang conversion on productions (head, body) with int symbols:
+    variables are numbered from 0, terminal t is encoded as ~t
+    """
+    start, key_prods = key
+    variables_idxs: Dict[Any, int] = dict()
+    terminals_idxs: Dict[Any, int] = dict()
+
+    def var(value) -> int:
+        return variables_idxs.setdefault(value, len(variables_idxs))
+
+    def symbol(is_terminal: bool, value) -> int:
+        if is_terminal:
+            return ~terminals_idxs.setdefault(value, len(terminals_idxs))
+        return var(value)
+
+    prods = {(var(head), tuple(symbol(*s) for s in body)) for head, body in key_prods}
+    start_idx = None if start is None else var(start)
+    n = len(variables_idxs)
+
+    # 1. remove unit productions: A -> body for every non-unit B -> body with A =>* B
+    unit_next: List[List[int]] = [[] for _ in range(n)]
+    bodies: List[List[Tuple[int, ...]]] = [[] for _ in range(n)]
+    for head, body in prods:
+        if len(body) == 1 and body[0] >= 0:
+            unit_next[head].append(body[0])
+        else:
+            bodies[head].append(body)
+    prods = {
+        (head, body)
+        for head in range(n)
+        for var_b in _closure(unit_next, [head])
+        for body in bodies[var_b]
+    }
+
+    # 2. remove productions with non-generating variables
+    prods_list = sorted(prods)
+    remaining = [sum(s >= 0 for s in body) for _, body in prods_list]
+    uses: List[List[int]] = [[] for _ in range(n)]
+    for i, (_, body) in enumerate(prods_list):
+        for s in body:
+            if s >= 0:
+                uses[s].append(i)
+    generating = [False] * n
+    queue = [head for (head, _), cnt in zip(prods_list, remaining) if cnt == 0]
+    for head in queue:
+        generating[head] = True
+    while queue:
+        for i in uses[queue.pop()]:
+            remaining[i] -= 1
+            head = prods_list[i][0]
+            if remaining[i] == 0 and not generating[head]:
+                generating[head] = True
+                queue.append(head)
+    prods_list = [
+        (head, body)
+        for head, body in prods_list
+        if all(s < 0 or generating[s] for s in body) and generating[head]
+    ]
+
+    # 3. remove productions with unreachable heads
+    body_vars: List[List[int]] = [[] for _ in range(n)]
+    for head, body in prods_list:
+        body_vars[head].extend(s for s in body if s >= 0)
+    reachable = _closure(body_vars, [] if start_idx is None else [start_idx])
+    prods_list = [(head, body) for head, body in prods_list if head in reachable]
+
+    # 4. replace terminals in bodies of length > 1 with new variables
+    terminal_values = list(terminals_idxs)
+    terminal_vars: Dict[int, int] = dict()
+    single_prods = []
+    for head, body in prods_list:
+        if len(body) > 1:
+            new_body = []
+            for s in body:
+                if s < 0 and s not in terminal_vars:
+                    terminal_vars[s] = var(str(terminal_values[~s]) + "#CNF#")
+                new_body.append(terminal_vars[s] if s < 0 else s)
+            body = tuple(new_body)
+        single_prods.append((head, body))
+    single_prods.extend((term_var, (s,)) for s, term_var in terminal_vars.items())
+
+    # 5. decompose bodies longer than 2, equal suffixes share variables
+    names = set(variables_idxs)
+    next_name = 0
+    suffix_vars: Dict[Tuple[int, ...], int] = dict()
+    res_prods = set()
+    for head, body in single_prods:
+        while len(body) > 2:
+            rest = body[1:]
+            if rest in suffix_vars:
+                res_prods.add((head, (body[0], suffix_vars[rest])))
+                break
+            next_name += 1
+            while "C#CNF#" + str(next_name) in names:
+                next_name += 1
+            suffix_vars[rest] = var("C#CNF#" + str(next_name))
+            res_prods.add((head, (body[0], suffix_vars[rest])))
+            head, body = suffix_vars[rest], rest
+        else:
+            res_prods.add((head, body))
+
+    # renumber variables and terminals used by productions
+    all_variables = list(variables_idxs)
+    used_vars = sorted({head for head, _ in res_prods})
+    used_vars_idxs = {v: i for i, v in enumerate(used_vars)}
+    used_terms = sorted({~s for _, body in res_prods for s in body if s < 0})
+    used_terms_idxs = {~t: i for i, t in enumerate(used_terms)}
+    epsilon_heads, terminal_prods, binary_prods = set(), set(), set()
+    for head, body in res_prods:
+        head = used_vars_idxs[head]
+        if len(body) == 0:
+            epsilon_heads.add(head)
+        elif len(body) == 1:
+            terminal_prods.add((head, used_terms_idxs[body[0]]))
+        else:
+            lhs, rhs = body
+            binary_prods.add((head, used_vars_idxs[lhs], used_vars_idxs[rhs]))
+    return WCNF(
+        None if start is None else Variable(start),
+        tuple(Variable(all_variables[v]) for v in used_vars),
+        tuple(Terminal(terminal_values[t]) for t in used_terms),
+        tuple(sorted(epsilon_heads)),
+        tuple(sorted(terminal_prods)),
+        tuple(sorted(binary_prods)),
+    )
+
+
+def get_wcnf(cfg: CFG) -> WCNF:
+    """
+    Get weak Chomsky normal form of the grammar from bounded LRU cache
+    keyed by canonical text of its productions, so equal grammars are normalized once.
+    """
+    return _normalize_grammar(_grammar_key(cfg))
+
+
+class CompiledGrammar(NamedTuple):
+    """
+    WCNF grammar with lookup tables of CFPQ engines, variables are numbered as in WCNF.
+    terminal_heads[terminals_idxs[label]] are heads of A -> label productions,
+    binary_heads[(B, C)] are heads of A -> B C productions,
+    uses[B] are indexes of binary_prods with B in the body.
+    Compiled grammars are shared by cache, so all fields are tuples or read-only mappings.
+    """
+
+    variables: Tuple[Variable, ...]
+    terminals_idxs: Mapping[Any, int]
+    terminal_heads: Tuple[Tuple[int, ...], ...]
+    nullable_heads: Tuple[int, ...]
+    binary_prods: Tuple[Tuple[int, int, int], ...]
+    binary_heads: Mapping[Tuple[int, int], Tuple[int, ...]]
+    uses: Tuple[Tuple[int, ...], ...]
+
+    def heads_by_label(self, label) -> Tuple[int, ...]:
+        """
+        Get heads of productions with the only terminal with value label in the body
+        """
+        terminal = self.terminals_idxs.get(label)
+        return () if terminal is None else self.terminal_heads[terminal]
+
+
+@lru_cache(maxsize=WCNF_CACHE_SIZE)
+def _compile_normalized_grammar(key: _GrammarKey) -> CompiledGrammar:
+    wcnf = _normalize_grammar(key)
+    terminal_heads: List[List[int]] = [[] for _ in wcnf.terminals]
+    for head, terminal in wcnf.terminal_prods:
+        terminal_heads[terminal].append(head)
+    binary_heads: Dict[Tuple[int, int], List[int]] = dict()
+    uses: List[List[int]] = [[] for _ in wcnf.variables]
+    for i, (head, lhs, rhs) in enumerate(wcnf.binary_prods):
+        binary_heads.setdefault((lhs, rhs), []).append(head)
+        uses[lhs].append(i)
+        if rhs != lhs:
+            uses[rhs].append(i)
+    return CompiledGrammar(
+        wcnf.variables,
+        MappingProxyType(
+            {terminal.value: i for i, terminal in enumerate(wcnf.terminals)}
+        ),
+        tuple(map(tuple, terminal_heads)),
+        wcnf.epsilon_heads,
+        wcnf.binary_prods,
+        MappingProxyType({body: tuple(heads) for body, heads in binary_heads.items()}),
+        tuple(map(tuple, uses)),
+    )
+
+
+def compile_grammar(cfg: CFG) -> CompiledGrammar:
+    """
+    Get WCNF of the grammar with lookup tables from the same cache as get_wcnf
+    """
+    return _compile_normalized_grammar(_grammar_key(cfg))
+
+
+def wcnf_cache_info():
+    """
+    Get hits, misses, maximum and current size of cache of normalized grammars
+    """
+    return _normalize_grammar.cache_info()
+
+
+def clear_wcnf_cache() -> None:
+    _normalize_grammar.cache_clear()
+    _compile_normalized_grammar.cache_clear()
+
+
+def set_wcnf_cache_size(size: Union[int, None]) -> None:
+    """
+    Set number of normalized and compiled grammars kept in cache, None means unbounded.
+    Cached grammars are dropped.
+    """
+    global WCNF_CACHE_SIZE, _normalize_grammar, _compile_normalized_grammar
+    WCNF_CACHE_SIZE = size
+    _normalize_grammar = lru_cache(maxsize=size)(_normalize_grammar.__wrapped__)
+    _compile_normalized_grammar = lru_cache(maxsize=size)(
+        _compile_normalized_grammar.__wrapped__
+    )
 
 
 def convert_cfg_to_wcnf(cfg: CFG) -> CFG:
@@ -9,11 +297,7 @@ def convert_cfg_to_wcnf(cfg: CFG) -> CFG:
     3. remove productions with more than one terminal
     4. decompose productions with more than 2 symbols in rhs
     """
-    new_cfg = cfg.eliminate_unit_productions().remove_useless_symbols()
-    new_productions = new_cfg._get_productions_with_only_single_terminals()
-    new_productions = new_cfg._decompose_productions(new_productions)
-    new_cfg = CFG(start_symbol=cfg.start_symbol, productions=set(new_productions))
-    return new_cfg
+    return get_wcnf(cfg).to_cfg()
 
 
 def read_cfg_from_file(filename: str) -> CFG:
@@ -0,0 +1,222 @@
+from typing import Any, Dict, Iterable, List, NamedTuple, Tuple
+import numpy as np
+from pyformlang.finite_automaton import (
+    DeterministicFiniteAutomaton,
+    Epsilon,
+    EpsilonNFA,
+    State,
+    Symbol,
+)
+
+
+class DFATable(NamedTuple):
+    """
+    DFA with start state 0 as transition table: delta[state, symbol id] is the next state or -1
+    """
+
+    symbols: List[Any]
+    delta: np.ndarray
+    is_final: np.ndarray
+
+
+def determinize(
+    states_cnt: int,
+    symbols: List[Any],
+    transitions: Iterable[Tuple[int, int, int]],
+    epsilons: Iterable[Tuple[int, int]],
+    starts: Iterable[int],
+    finals: Iterable[int],
+) -> DFATable:
+    """
+    Subset construction over NFA with integer states, sets of states are kept as int bitmasks
+    """
+    eps_next: List[List[int]] = [[] for _ in range(states_cnt)]
+    for src, dst in epsilons:
+        eps_next[src].append(dst)
+    closures = []
+    for state in range(states_cnt):
+        closure, stack = 1 << state, [state]
+        while stack:
+            for nxt in eps_next[stack.pop()]:
+                if not closure >> nxt & 1:
+                    closure |= 1 << nxt
+                    stack.append(nxt)
+        closures.append(closure)
+
+    moves: List[Dict[int, int]] = [dict() for _ in range(states_cnt)]
+    for src, symbol, dst in transitions:
+        moves[src][symbol] = moves[src].get(symbol, 0) | closures[dst]
+    finals_mask = 0
+    for state in finals:
+        finals_mask |= 1 << state
+
+    def bits(mask):
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    start = 0
+    for state in starts:
+        start |= closures[state]
+    subsets = {start: 0}
+    queue = [start]
+    rows = []
+    while len(rows) < len(queue):
+        subset = queue[len(rows)]
+        row = [-1] * len(symbols)
+        targets: Dict[int, int] = dict()
+        for state in bits(subset):
+            for symbol, mask in moves[state].items():
+                targets[symbol] = targets.get(symbol, 0) | mask
+        for symbol, target in targets.items():
+            if target not in subsets:
+                subsets[target] = len(queue)
+                queue.append(target)
+            row[symbol] = subsets[target]
+        rows.append(row)
+
+    delta = np.array(rows, dtype=np.int64).reshape(len(rows), len(symbols))
+    is_final = np.array([subset & finals_mask != 0 for subset in queue])
+    return DFATable(list(symbols), delta, is_final)
+
+
+def _hopcroft_classes(delta: np.ndarray, is_final: np.ndarray) -> np.ndarray:
+    """
+    Hopcroft partition refinement of complete transition table.
+    Return class of every state, states get the same class iff they are equivalent.
+    """
+    n, k = delta.shape
+    block_of = np.zeros(n, dtype=np.int64)
+    blocks = [np.flatnonzero(~is_final)]
+    if 0 < np.count_nonzero(is_final) < n:
+        blocks.append(np.flatnonzero(is_final))
+        block_of[blocks[1]] = 1
+    elif np.all(is_final):
+        blocks = [np.arange(n)]
+    smaller = int(len(blocks) == 2 and len(blocks[1]) < len(blocks[0]))
+    worklist = {(smaller, a) for a in range(k)} if len(blocks) == 2 else set()
+
+    while worklist:
+        splitter, a = worklist.pop()
+        in_splitter = np.zeros(n, dtype=np.bool_)
+        in_splitter[blocks[splitter]] = True
+        preds = in_splitter[delta[:, a]]
+        for block in np.unique(block_of[preds]).tolist():
+            inside = preds[blocks[block]]
+            if inside.all():
+                continue
+            new_block = len(blocks)
+            blocks.append(blocks[block][~inside])
+            blocks[block] = blocks[block][inside]
+            block_of[blocks[new_block]] = new_block
+            for c in range(k):
+                if (block, c) in worklist:
+                    worklist.add((new_block, c))
+                elif len(blocks[block]) <= len(blocks[new_block]):
+                    worklist.add((block, c))
+                else:
+                    worklist.add((new_block, c))
+    return block_of
+
+
+def minimize_dfa_table(dfa: DFATable) -> DFATable:
+    """
+    Minimize DFA with Hopcroft algorithm and remove states from which no final state is reachable.
+    States are renumbered in BFS order from start state 0.
+    """
+    n, k = dfa.delta.shape
+    # missing transitions go to extra dead state n
+    delta = np.vstack([dfa.delta, np.full((1, k), n, dtype=np.int64)])
+    delta[delta < 0] = n
+    is_final = np.append(dfa.is_final, False)
+    classes = _hopcroft_classes(delta, is_final)
+
+    n_classes = int(classes.max()) + 1
+    class_delta = np.full((n_classes, k), -1, dtype=np.int64)
+    class_delta[classes] = classes[delta]
+    class_final = np.zeros(n_classes, dtype=np.bool_)
+    class_final[classes[is_final]] = True
+
+    # classes from which final class is reachable
+    live = class_final.copy()
+    changed = True
+    while changed:
+        reach = live[class_delta].any(axis=1) | class_final
+        changed = bool(np.any(reach != live))
+        live = reach
+
+    order, idxs = [], {}
+    start = int(classes[0])
+    if live[start]:
+        order, idxs = [start], {start: 0}
+    for cls in order:
+        for nxt in class_delta[cls].tolist():
+            if live[nxt] and nxt not in idxs:
+                idxs[nxt] = len(order)
+                order.append(nxt)
+
+    new_delta = np.full((len(order), k), -1, dtype=np.int64)
+    for i, cls in enumerate(order):
+        for a, nxt in enumerate(class_delta[cls].tolist()):
+            if nxt in idxs:
+                new_delta[i, a] = idxs[nxt]
+    return DFATable(dfa.symbols, new_delta, class_final[order])
+
+
+# (number of states, symbols, [(src, symbol id, dst)], [(src, dst)] of epsilons, starts, finals)
+IntNFA = Tuple[
+    int,
+    List[Any],
+    List[Tuple[int, int, int]],
+    List[Tuple[int, int]],
+    List[int],
+    List[int],
+]
+
+
+def fa_to_int_nfa(fa: EpsilonNFA) -> IntNFA:
+    """
+    Number states and symbols of pyformlang automaton, return arguments of determinize
+    """
+    states_idxs = {s: i for i, s in enumerate(fa.states)}
+    symbols = [symb for symb in fa.symbols if not isinstance(symb, Epsilon)]
+    symbols_idxs = {symb: i for i, symb in enumerate(symbols)}
+    transitions, epsilons = [], []
+    for s_from, symb, s_to in fa:
+        if isinstance(symb, Epsilon):
+            epsilons.append((states_idxs[s_from], states_idxs[s_to]))
+        else:
+            transitions.append(
+                (states_idxs[s_from], symbols_idxs[symb], states_idxs[s_to])
+            )
+    return (
+        len(states_idxs),
+        [symb.value for symb in symbols],
+        transitions,
+        epsilons,
+        [states_idxs[s] for s in fa.start_states],
+        [states_idxs[s] for s in fa.final_states],
+    )
+
+
+def fa_to_dfa_table(fa: EpsilonNFA) -> DFATable:
+    """
+    Convert pyformlang automaton to minimal DFA table
+    """
+    return minimize_dfa_table(determinize(*fa_to_int_nfa(fa)))
+
+
+def dfa_table_to_dfa(dfa: DFATable) -> DeterministicFiniteAutomaton:
+    res = DeterministicFiniteAutomaton()
+    if len(dfa.delta) > 0:
+        res.add_start_state(State(0))
+    for state in np.flatnonzero(dfa.is_final).tolist():
+        res.add_final_state(State(state))
+    for state, symbol in zip(*np.nonzero(dfa.delta >= 0)):
+        res.add_transition(
+            State(int(state)),
+            Symbol(dfa.symbols[symbol]),
+            State(int(dfa.delta[state, symbol])),
+        )
+    return res
@@ -27,6 +27,8 @@ class ECFG:
         terminals = set()
         for line in text.strip().split("\n"):
             var, body = map(str.strip, line.split("->"))
+            if not body:
+                body = "$"
             if var in regexes:
                 regexes[var] += " | " + body
             else:
@@ -39,10 +41,10 @@ class ECFG:
             )
             bodies.add(body)
 
-        regexes = {var: Regex(body) for var, body in regexes.items()}
+        regexes = {Variable(var): Regex(body) for var, body in regexes.items()}
         ecfg = ECFG()
         ecfg.terminals = terminals
-        ecfg.variables = {Variable(var) for var in regexes.keys()}
+        ecfg.variables = set(regexes.keys())
         ecfg.start_symbol = Variable("S")
         ecfg.productions = regexes
         return ecfg
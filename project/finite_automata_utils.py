@@ -1,24 +1,200 @@
-from functools import reduce
-from typing import Any, Iterable, Union, Dict, Tuple, Set
+from functools import lru_cache
+from typing import Any, Iterable, List, NamedTuple, Union, Dict, Tuple, Set
+import unicodedata
 from pyformlang.finite_automaton import (
     FiniteAutomaton,
     NondeterministicFiniteAutomaton,
     DeterministicFiniteAutomaton,
+    Epsilon,
     EpsilonNFA,
     State,
     Symbol,
 )
 from pyformlang.regular_expression import PythonRegex
 import networkx as nx
-from scipy.sparse import csr_matrix, kron, block_diag
+from scipy.sparse import coo_matrix, csr_matrix, identity
 import numpy as np
 
+from project.dfa_table import (
+    DFATable,
+    determinize,
+    dfa_table_to_dfa,
+    fa_to_dfa_table,
+    minimize_dfa_table,
+)
+from project.graph_cache import (
+    GraphDecomposition,
+    file_key,
+    get_cached_decomposition,
+)
+from project.graph_utils import is_labeled_graph_file, read_graph
+from project.labeled_graph import LabeledGraph
+from project.semiring import Semiring, get_semiring
+
+_EPSILON_LABELS = ("epsilon", "ɛ")
+
+# number of compiled queries kept by compile_query, change it with set_query_cache_size
+QUERY_CACHE_SIZE = 512
+
+
+class _UnsupportedRegex(Exception):
+    pass
+
+
+# characters of python regex syntax handled only by pyformlang
+_REGEX_UNSUPPORTED = set(".\\{}^$")
+
+
+def _parse_regex(regex: str):
+    """
+    Parse regex with literals, [..] classes with ranges, |, *, +, ?, () and concatenation
+    to tree of ("sym", chars), ("cat", lhs, rhs), ("alt", lhs, rhs) and (op, arg) nodes
+    """
+    pos = 0
+
+    def peek():
+        return regex[pos] if pos < len(regex) else None
+
+    def parse_alt():
+        nonlocal pos
+        node = parse_cat()
+        while peek() == "|":
+            pos += 1
+            node = ("alt", node, parse_cat())
+        return node
+
+    def parse_cat():
+        node = None
+        while peek() is not None and peek() not in "|)":
+            rep = parse_rep()
+            node = rep if node is None else ("cat", node, rep)
+        if node is None:
+            raise _UnsupportedRegex("empty branch")
+        return node
+
+    def parse_rep():
+        nonlocal pos
+        node = parse_atom()
+        if peek() is not None and peek() in "*+?":
+            node = ({"*": "star", "+": "plus", "?": "opt"}[peek()], node)
+            pos += 1
+            if peek() is not None and peek() in "*+?":
+                raise _UnsupportedRegex("repeated quantifier")
+        return node
+
+    def parse_atom():
+        nonlocal pos
+        char = peek()
+        pos += 1
+        if char == "(":
+            node = parse_alt()
+            if peek() != ")":
+                raise _UnsupportedRegex("unbalanced parenthesis")
+            pos += 1
+            return node
+        if char == "[":
+            return ("sym", parse_class())
+        if char in _REGEX_UNSUPPORTED or char in "*+?]":
+            raise _UnsupportedRegex(f"unsupported character {char!r}")
+        return ("sym", [char])
+
+    def parse_class():
+        nonlocal pos
+        end = regex.find("]", pos)
+        body = regex[pos:end]
+        if end < 0 or len(body) == 0 or body[0] == "^":
+            raise _UnsupportedRegex("unsupported character class")
+        if any(char in _REGEX_UNSUPPORTED or char == "[" for char in body):
+            raise _UnsupportedRegex("unsupported character class")
+        pos = end + 1
+        chars = []
+        i = 0
+        while i < len(body):
+            if i + 2 < len(body) and body[i + 1] == "-":
+                if body[i] > body[i + 2]:
+                    raise _UnsupportedRegex("reversed range")
+                chars.extend(chr(c) for c in range(ord(body[i]), ord(body[i + 2]) + 1))
+                i += 3
+            elif body[i] == "-":
+                raise _UnsupportedRegex("unsupported range")
+            else:
+                chars.append(body[i])
+                i += 1
+        return chars
+
+    tree = parse_alt()
+    if pos != len(regex):
+        raise _UnsupportedRegex("unbalanced parenthesis")
+    return tree
+
+
+def _thompson_nfa(
+    tree,
+) -> Tuple[int, List[str], List[Tuple[int, int, int]], List[Tuple[int, int]]]:
+    """
+    Build NFA with start state 0 and final state 1 from regex tree.
+    Return number of states, symbols, (src, symbol id, dst) transitions and (src, dst) epsilon transitions.
+    """
+    symbols_idxs: Dict[str, int] = dict()
+    transitions, epsilons = [], []
+    states_cnt = 2
+
+    def new_state():
+        nonlocal states_cnt
+        states_cnt += 1
+        return states_cnt - 1
+
+    def build(node, start, final):
+        kind = node[0]
+        if kind == "sym":
+            for char in node[1]:
+                symbol = symbols_idxs.setdefault(char, len(symbols_idxs))
+                transitions.append((start, symbol, final))
+        elif kind == "cat":
+            middle = new_state()
+            build(node[1], start, middle)
+            build(node[2], middle, final)
+        elif kind == "alt":
+            build(node[1], start, final)
+            build(node[2], start, final)
+        else:
+            inner_start, inner_final = new_state(), new_state()
+            epsilons.append((start, inner_start))
+            epsilons.append((inner_final, final))
+            build(node[1], inner_start, inner_final)
+            if kind in ("star", "opt"):
+                epsilons.append((start, final))
+            if kind in ("star", "plus"):
+                epsilons.append((inner_final, inner_start))
+
+    build(tree, 0, 1)
+    return states_cnt, list(symbols_idxs), transitions, epsilons
+
+
+def _compile_regex_table(regex: str) -> DFATable:
+    """
+    Build minimal DFA table of regex without pyformlang objects,
+    raise _UnsupportedRegex if regex uses syntax that is not handled natively
+    """
+    states_cnt, symbols, transitions, epsilons = _thompson_nfa(_parse_regex(regex))
+    dfa = determinize(states_cnt, symbols, transitions, epsilons, [0], [1])
+    return minimize_dfa_table(dfa)
+
+
+def _regex_to_dfa_table(regex: str) -> DFATable:
+    try:
+        return _compile_regex_table(regex)
+    except _UnsupportedRegex:
+        return fa_to_dfa_table(PythonRegex(regex).to_epsilon_nfa())
+
 
 def build_min_dfa_from_regex(regex_str: str) -> DeterministicFiniteAutomaton:
     """
-    Build minimal DFA from python regex
+    Build minimal DFA from python regex.
+    Literals, [...] classes with ranges, |, *, +, ? and () are compiled natively,
+    other regexes are compiled by pyformlang.
     """
-    return PythonRegex(regex_str).to_epsilon_nfa().minimize()
+    return dfa_table_to_dfa(_regex_to_dfa_table(regex_str))
 
 
 def convert_nx_graph_to_nfa(
@@ -42,6 +218,43 @@ def convert_nx_graph_to_nfa(
     return nfa
 
 
+def build_bool_matrix(rows: np.ndarray, cols: np.ndarray, n: int) -> csr_matrix:
+    """
+    Build n x n bool matrix with True at every (rows[k], cols[k]) position
+    """
+    data = np.ones(len(rows), dtype=np.bool_)
+    return coo_matrix((data, (rows, cols)), shape=(n, n), dtype=np.bool_).tocsr()
+
+
+def build_bool_matrices(
+    edges: Iterable[Tuple[int, Any, int]], n: int
+) -> Dict[Any, csr_matrix]:
+    """
+    Build n x n bool matrices for every label from (row, label, col) triples
+    Every matrix is built at once from index arrays instead of setting elements one by one
+    """
+    labels_idxs: Dict[Any, int] = dict()
+    rows, cols, label_ids = [], [], []
+    for row, label, col in edges:
+        rows.append(row)
+        cols.append(col)
+        label_ids.append(labels_idxs.setdefault(label, len(labels_idxs)))
+
+    rows = np.array(rows, dtype=np.int64)
+    cols = np.array(cols, dtype=np.int64)
+    label_ids = np.array(label_ids, dtype=np.int64)
+    order = np.argsort(label_ids, kind="stable")
+    bounds = np.searchsorted(label_ids[order], np.arange(len(labels_idxs) + 1))
+    return {
+        label: build_bool_matrix(
+            rows[order[bounds[i] : bounds[i + 1]]],
+            cols[order[bounds[i] : bounds[i + 1]]],
+            n,
+        )
+        for label, i in labels_idxs.items()
+    }
+
+
 def get_bool_matrices_for_fa(
     fa: EpsilonNFA,
 ) -> Tuple[Dict[Symbol, csr_matrix], Dict[State, int]]:
@@ -49,32 +262,98 @@ def get_bool_matrices_for_fa(
     Get bool matrices for finite automaton
     Return matrices for every symbol and indexes of every state
     """
-
-    def get_bool_matrix(n):
-        return csr_matrix((n, n), dtype=np.bool_)
-
+    n = len(fa.states)
     states_idxs = {s: i for i, s in enumerate(fa.states)}
-    bool_matrices = {symb: get_bool_matrix(len(fa.states)) for symb in fa.symbols}
-    for s_from, symbol, s_to in fa:
-        matrix = bool_matrices[symbol]
-        matrix[states_idxs[s_from], states_idxs[s_to]] = True
+    bool_matrices = {symb: csr_matrix((n, n), dtype=np.bool_) for symb in fa.symbols}
+    bool_matrices.update(
+        build_bool_matrices(
+            (
+                (states_idxs[s_from], symbol, states_idxs[s_to])
+                for s_from, symbol, s_to in fa
+            ),
+            n,
+        )
+    )
     return bool_matrices, states_idxs
 
 
-def _intersect_matrices(lhs_fa, rhs_fa):
-    lhs_matrices, _ = get_bool_matrices_for_fa(lhs_fa)
-    rhs_matrices, _ = get_bool_matrices_for_fa(rhs_fa)
-    symbols = lhs_fa.symbols.intersection(rhs_fa.symbols)
-    matrices = {symb: kron(lhs_matrices[symb], rhs_matrices[symb]) for symb in symbols}
+class CompiledQuery(NamedTuple):
+    """
+    Minimal DFA of query regex as bool matrix for every symbol, its states are 0..states_cnt-1
+    """
 
-    def get_pairs_states(lhs_states, rhs_states):
-        return [State((lhs_s, rhs_s)) for lhs_s in lhs_states for rhs_s in rhs_states]
+    matrices: Dict[Symbol, csr_matrix]
+    states_cnt: int
+    start_idxs: np.ndarray
+    final_idxs: np.ndarray
+
+    def to_dfa(self) -> DeterministicFiniteAutomaton:
+        res = DeterministicFiniteAutomaton()
+        for state in self.start_idxs.tolist():
+            res.add_start_state(State(state))
+        for state in self.final_idxs.tolist():
+            res.add_final_state(State(state))
+        for symb, matrix in self.matrices.items():
+            for s_from, s_to in zip(*matrix.nonzero()):
+                res.add_transition(State(int(s_from)), symb, State(int(s_to)))
+        return res
 
-    states = get_pairs_states(lhs_fa.states, rhs_fa.states)
-    start_states = get_pairs_states(lhs_fa.start_states, rhs_fa.start_states)
-    final_states = get_pairs_states(lhs_fa.final_states, rhs_fa.final_states)
 
-    return matrices, states, start_states, final_states
+@lru_cache(maxsize=QUERY_CACHE_SIZE)
+def _compile_normalized_query(regex: str) -> CompiledQuery:
+    dfa = _regex_to_dfa_table(regex)
+    states_cnt = len(dfa.delta)
+    matrices = dict()
+    for a, symbol in enumerate(dfa.symbols):
+        rows = np.flatnonzero(dfa.delta[:, a] >= 0)
+        matrices[Symbol(symbol)] = build_bool_matrix(
+            rows, dfa.delta[rows, a], states_cnt
+        )
+    return CompiledQuery(
+        matrices,
+        states_cnt,
+        np.arange(min(states_cnt, 1), dtype=np.int64),
+        np.flatnonzero(dfa.is_final),
+    )
+
+
+def compile_query(regex: str) -> CompiledQuery:
+    """
+    Get compiled query from bounded LRU cache keyed by regex text in Unicode NFC form.
+    Whitespace is kept, because it is a symbol of the regex.
+    Compiled queries are shared, so they must not be changed.
+    """
+    return _compile_normalized_query(unicodedata.normalize("NFC", regex))
+
+
+def query_cache_info():
+    """
+    Get hits, misses, maximum and current size of cache of compiled queries
+    """
+    return _compile_normalized_query.cache_info()
+
+
+def clear_query_cache() -> None:
+    _compile_normalized_query.cache_clear()
+
+
+def set_query_cache_size(size: Union[int, None]) -> None:
+    """
+    Set number of compiled queries kept by compile_query, None means unbounded.
+    Cached queries are dropped.
+    """
+    global QUERY_CACHE_SIZE, _compile_normalized_query
+    QUERY_CACHE_SIZE = size
+    _compile_normalized_query = lru_cache(maxsize=size)(
+        _compile_normalized_query.__wrapped__
+    )
+
+
+def _get_transitions(fa: EpsilonNFA) -> Dict[State, Dict[Symbol, Set[State]]]:
+    transitions = dict()
+    for s_from, symbol, s_to in fa:
+        transitions.setdefault(s_from, dict()).setdefault(symbol, set()).add(s_to)
+    return transitions
 
 
 def intersect_two_fa(lhs_fa: EpsilonNFA, rhs_fa: EpsilonNFA) -> EpsilonNFA:
@@ -82,149 +361,425 @@ def intersect_two_fa(lhs_fa: EpsilonNFA, rhs_fa: EpsilonNFA) -> EpsilonNFA:
     Intersect one EpsilonNFA with the other.
     The result is EpsilonNFA that accepts only words that accept both original NFA's.
     The result states is pairs of states original NFA's.
+    Only pairs reachable from pairs of start states are built.
     """
-    matrices, states, start_states, final_states = _intersect_matrices(lhs_fa, rhs_fa)
+    lhs_transitions = _get_transitions(lhs_fa)
+    rhs_transitions = _get_transitions(rhs_fa)
+    symbols = lhs_fa.symbols.intersection(rhs_fa.symbols)
 
     result_fa = EpsilonNFA()
-    for symb, matrix in matrices.items():
-        for row, col in zip(*matrix.nonzero()):
-            s_from = states[row]
-            s_to = states[col]
-            result_fa.add_transition(s_from, symb, s_to)
-            if s_from in start_states:
-                result_fa.add_start_state(s_from)
-            if s_to in final_states:
-                result_fa.add_final_state(s_to)
+    start_pairs = [
+        (lhs_s, rhs_s) for lhs_s in lhs_fa.start_states for rhs_s in rhs_fa.start_states
+    ]
+    for pair in start_pairs:
+        result_fa.add_start_state(State(pair))
+
+    visited = set(start_pairs)
+    queue = list(start_pairs)
+    while len(queue) > 0:
+        lhs_s, rhs_s = queue.pop()
+        s_from = State((lhs_s, rhs_s))
+        if lhs_s in lhs_fa.final_states and rhs_s in rhs_fa.final_states:
+            result_fa.add_final_state(s_from)
+
+        lhs_steps = lhs_transitions.get(lhs_s, dict())
+        rhs_steps = rhs_transitions.get(rhs_s, dict())
+        for symb in symbols.intersection(lhs_steps.keys(), rhs_steps.keys()):
+            for lhs_to in lhs_steps[symb]:
+                for rhs_to in rhs_steps[symb]:
+                    result_fa.add_transition(s_from, symb, State((lhs_to, rhs_to)))
+                    if (lhs_to, rhs_to) not in visited:
+                        visited.add((lhs_to, rhs_to))
+                        queue.append((lhs_to, rhs_to))
 
     return result_fa
 
 
-def query_regex_to_fa(db_fa: EpsilonNFA, query: str) -> Set[Tuple[State, State]]:
+def get_transitive_closure(
+    matrix: Any,
+    closure: Any = None,
+    start_rows: Union[Iterable[int], None] = None,
+    semiring: Union[Semiring, None] = None,
+) -> Any:
+    """
+    Get transitive closure of square matrix: (i, j) is set if j is reachable from i by nonempty path.
+    Only entries added on the previous iteration are propagated.
+    You can pass closure of a matrix with a subset of entries of the given one, it is extended instead of recomputing.
+    You can specify start_rows, then only these rows are computed and the others are left empty.
+    Matrices are in representation of the semiring, by default bool csr_matrix of boolean semiring.
+    With tropical semiring entries of the closure are lengths of shortest paths.
+    """
+    if semiring is None:
+        semiring = get_semiring()
+
+    if start_rows is not None:
+        start_rows = np.fromiter(start_rows, dtype=np.int64)
+        selection = semiring.selection(
+            np.arange(len(start_rows)),
+            start_rows,
+            (len(start_rows), matrix.shape[0]),
+        )
+        res = semiring.matmul(selection, matrix)
+        delta = res
+        while semiring.nnz(delta) > 0:
+            delta = semiring.improved(semiring.matmul(delta, matrix), res)
+            res = semiring.add(res, delta)
+        return semiring.matmul(semiring.transpose(selection), res)
+
+    if closure is None:
+        res = semiring.add(semiring.zeros(matrix.shape), matrix)
+        delta = matrix
+    else:
+        res = semiring.add(closure, matrix)
+        delta = semiring.improved(matrix, closure)
+    while semiring.nnz(delta) > 0:
+        delta = semiring.improved(
+            semiring.add(semiring.matmul(delta, res), semiring.matmul(res, delta)),
+            res,
+        )
+        res = semiring.add(res, delta)
+    return res
+
+
+def query_regex_to_fa(
+    db_fa: EpsilonNFA,
+    query: str,
+    from_start_states_only: bool = True,
+    backend: Union[str, None] = None,
+) -> Set[Tuple[State, State]]:
     """
     Execute query regex to finite automaton.
     Return all pairs of start and final states of fa that form word corresponding to the regex.
+    By default, reachability is propagated only from start states of the intersection,
+    set from_start_states_only to False to compute closure over all pairs of states.
+    Matrix operations are executed by given backend of boolean semiring, see project.semiring.
     """
 
-    def get_transitive_closure(matrix: csr_matrix):
-        prev_count = 0
-        res: csr_matrix = matrix.copy()
-        while res.count_nonzero() != prev_count:
-            prev_count = res.count_nonzero()
-            res = res + (res @ res)
-        return res
+    semiring = get_semiring("boolean", backend)
+    compiled = compile_query(query)
+    db_matrices, db_states_idxs = get_bool_matrices_for_fa(db_fa)
+    q = compiled.states_cnt
+    n = len(db_states_idxs) * q
+    union_matrix = semiring.zeros((n, n))
+    for symb in set(db_matrices.keys()).intersection(compiled.matrices.keys()):
+        union_matrix = semiring.add(
+            union_matrix,
+            semiring.kron(
+                semiring.from_bool(db_matrices[symb]),
+                semiring.from_bool(compiled.matrices[symb]),
+            ),
+        )
+
+    def get_pairs_idxs(db_states, query_idxs):
+        # state (db state i, query state j) has index i * q + j in kron product
+        return np.array(
+            [db_states_idxs[s] * q + j for s in db_states for j in query_idxs.tolist()],
+            dtype=np.int64,
+        )
+
+    start_idxs = get_pairs_idxs(db_fa.start_states, compiled.start_idxs)
+    final_idxs = get_pairs_idxs(db_fa.final_states, compiled.final_idxs)
+    final_mask = semiring.selection(final_idxs, final_idxs, (n, n))
+
+    if from_start_states_only:
+        reachable = get_transitive_closure(
+            union_matrix, start_rows=start_idxs, semiring=semiring
+        )
+    else:
+        start_mask = semiring.selection(start_idxs, start_idxs, (n, n))
+        closure = get_transitive_closure(union_matrix, semiring=semiring)
+        reachable = semiring.matmul(start_mask, closure)
+    reachable = semiring.matmul(reachable, final_mask)
+
+    db_states = {i: s for s, i in db_states_idxs.items()}
+    rows, cols = semiring.nonzero(reachable)
+    return {(db_states[row // q], db_states[col // q]) for row, col in zip(rows, cols)}
+
+
+def build_graph_decomposition(
+    edges: Iterable[Tuple[Any, Any, Any]], nodes: Union[Iterable[Any], None] = None
+) -> GraphDecomposition:
+    """
+    Build bool matrices for every label from (source, label, target) edges without building automaton.
+    Given nodes get first indexes, other nodes are indexed in order of appearance in edges.
+    Edges labeled "epsilon" are folded into matrices of other labels as in automaton without epsilon transitions.
+    """
+    nodes_idxs: Dict[Any, int] = dict()
+    for node in nodes if nodes is not None else []:
+        nodes_idxs.setdefault(node, len(nodes_idxs))
+    indexed_edges = [
+        (
+            nodes_idxs.setdefault(u, len(nodes_idxs)),
+            Epsilon() if label in _EPSILON_LABELS else Symbol(label),
+            nodes_idxs.setdefault(v, len(nodes_idxs)),
+        )
+        for u, label, v in edges
+    ]
+    n = len(nodes_idxs)
+    matrices = build_bool_matrices(indexed_edges, n)
+
+    epsilon_matrix = matrices.pop(Epsilon(), None)
+    if epsilon_matrix is not None:
+        reflexive = identity(n, dtype=np.bool_, format="csr")
+        closure = get_transitive_closure(epsilon_matrix).tocsr() + reflexive
+        matrices = {
+            symb: (closure @ matrix @ closure).tocsr()
+            for symb, matrix in matrices.items()
+        }
+
+    return GraphDecomposition(list(nodes_idxs), nodes_idxs, matrices)
+
+
+def _build_graph_decomposition(graph: nx.MultiDiGraph) -> GraphDecomposition:
+    return build_graph_decomposition(
+        (
+            (u, label, v)
+            for u, v, label in graph.edges(data="label")
+            if label is not None
+        ),
+        graph.nodes,
+    )
 
-    def union_matrix(matrix: Dict[Symbol, csr_matrix]):
-        return reduce(lambda res, m: res + m, matrix.values())
 
-    def get_db_pair(s_from, s_to):
-        db_s_from, _ = s_from.value
-        db_s_to, _ = s_to.value
-        return db_s_from, db_s_to
+def _decompose_labeled_graph(graph: LabeledGraph) -> GraphDecomposition:
+    matrices = graph.label_matrices([Symbol(label) for label in graph.labels])
+    return GraphDecomposition(graph.nodes, graph.node_index(), matrices)
 
-    query_fa = build_min_dfa_from_regex(query)
-    matrices, states, start_states, final_states = _intersect_matrices(db_fa, query_fa)
-    closure = get_transitive_closure(union_matrix(matrices))
-    result = set()
-    for row, col in zip(*closure.nonzero()):
-        s_from = states[row]
-        s_to = states[col]
-        if s_from in start_states and s_to in final_states:
-            db_pair = get_db_pair(s_from, s_to)
-            if db_pair not in result:
-                result.add(db_pair)
-    return result
+
+def _read_graph_decomposition(path: str) -> GraphDecomposition:
+    return _decompose_labeled_graph(read_graph(path))
+
+
+def get_graph_decomposition(
+    graph: Union[nx.MultiDiGraph, LabeledGraph, str],
+    cache_dir: Union[str, None] = None,
+    key: Union[str, None] = None,
+) -> GraphDecomposition:
+    """
+    Get bool matrices for every label of the graph and index of every node.
+    Graph given by path is read by graph_utils.read_graph.
+    Matrices of LabeledGraph are built from its arrays, matrices of networkx graph
+    are built directly from its edges, see build_graph_decomposition.
+    Decompositions of networkx graphs and DOT files are taken from on-disk cache if it is enabled,
+    see project.graph_cache. DOT files are keyed by graph_cache.file_key, so a hit does not read the file.
+    networkx graphs are keyed by given key or by graph_cache.graph_fingerprint.
+    Binary graph files are memory-mapped and are not cached.
+    """
+    if isinstance(graph, str) and not is_labeled_graph_file(graph):
+        if key is None:
+            key = file_key(graph)
+        return get_cached_decomposition(
+            graph, _read_graph_decomposition, cache_dir, key
+        )
+    if isinstance(graph, str):
+        graph = read_graph(graph)
+    if isinstance(graph, LabeledGraph):
+        return _decompose_labeled_graph(graph)
+    return get_cached_decomposition(graph, _build_graph_decomposition, cache_dir, key)
 
 
 def query_regex_to_fa_with_states(
-    db_graph: nx.MultiDiGraph,
+    db_graph: Union[nx.MultiDiGraph, LabeledGraph, str],
     query: str,
     start_states: Union[Iterable[Any], None] = None,
     final_states: Union[Iterable[Any], None] = None,
-) -> Set[Tuple[State, State]]:
+) -> Set[Tuple[Any, Any]]:
     """
-    Execute query regex to finite automaton with given start and final states.
-    Return all pairs of start and final states of fa that form word corresponding to the regex.
+    Execute query regex to graph with given start and final states, by default all states are used.
+    Return all pairs of start and final states connected by nonempty path corresponding to the regex.
     """
-
-    return query_regex_to_fa(
-        convert_nx_graph_to_nfa(db_graph, start_states, final_states), query
+    decomposition = get_graph_decomposition(db_graph)
+    nodes = decomposition.nodes
+    if start_states is None:
+        start_states = nodes
+    if final_states is None:
+        final_states = nodes
+    starts = [
+        decomposition.nodes_idxs[s]
+        for s in set(start_states)
+        if s in decomposition.nodes_idxs
+    ]
+    finals = set(final_states)
+    res = _find_reachable_by_matrices(
+        decomposition.matrices,
+        len(nodes),
+        compile_query(query),
+        [[start] for start in starts],
+        get_semiring(),
+        nonempty_only=True,
     )
+    return {
+        (nodes[start], nodes[i])
+        for start, reached in zip(starts, res)
+        for i in reached
+        if nodes[i] in finals
+    }
 
 
-def find_reachable_in_fa_from_any(
-    db_fa: EpsilonNFA, regex: str, db_start_states: Iterable[Any]
-) -> Set[Any]:
+def _find_reachable_by_matrices(
+    db_matrices: Dict[Symbol, Any],
+    db_cnt: int,
+    query: CompiledQuery,
+    db_start_groups: List[Iterable[int]],
+    semiring: Semiring,
+    nonempty_only: bool = False,
+) -> List[Set[int]]:
     """
-    Execute query regex to finite automaton.
-    Return all reachable states from given db_start_states.
+    Multiple source BFS over bool matrices of db automaton with db_cnt states and compiled query.
+    The front is a stacked matrix with one block of columns per group of start state indexes,
+    so one traversal answers all groups.
+    With nonempty_only, states reached only by empty path are not reported.
+    Return indexes of reachable states for every group.
     """
-    query_fa = build_min_dfa_from_regex(regex)
-    db_matrices, db_state_idx = get_bool_matrices_for_fa(db_fa)
-    query_matrices, query_state_idx = get_bool_matrices_for_fa(query_fa)
-    db_cnt = len(db_fa.states)
-    query_cnt = len(query_fa.states)
+    query_matrices = query.matrices
+    query_cnt = query.states_cnt
+    groups_cnt = len(db_start_groups)
+    shape = (db_cnt + query_cnt, groups_cnt * query_cnt)
 
     def init_front():
-        front = csr_matrix((db_cnt + query_cnt, query_cnt), dtype=np.bool_)
-        for db_s in db_start_states:
-            for q_s in query_fa.start_states:
-                i = db_state_idx[db_s]
-                j = query_state_idx[q_s]
-                front[i, j] = True
-        for q_s in query_fa.start_states:
-            j = query_state_idx[q_s]
-            front[db_cnt + j, j] = True
-        return front
-
-    def step(front: csr_matrix, all_transitions: Iterable[csr_matrix]):
-        new_front = csr_matrix((db_cnt + query_cnt, query_cnt), dtype=np.bool_)
+        rows, cols = [], []
+        q_starts = query.start_idxs.tolist()
+        for b, db_starts in enumerate(db_start_groups):
+            for db_s in db_starts:
+                for j in q_starts:
+                    rows.append(db_s)
+                    cols.append(b * query_cnt + j)
+            for j in q_starts:
+                rows.append(db_cnt + j)
+                cols.append(b * query_cnt + j)
+        return semiring.selection(
+            np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64), shape
+        )
+
+    def step(front, all_transitions):
+        new_front = semiring.zeros(shape)
         for transitions in all_transitions:
-            prod_res = transitions @ front
-            for i in range(query_cnt):
-                for j in range(query_cnt):
-                    if prod_res[db_cnt + i, j]:
-                        new_front[:, i] += prod_res[:, j]
+            prod_res = semiring.matmul(transitions, front)
+            # column c = (block, j) whose query part moved to state i goes to column (block, i)
+            rows, cols = semiring.nonzero(prod_res)
+            query_moves = rows >= db_cnt
+            src_cols = cols[query_moves]
+            dst_cols = src_cols - src_cols % query_cnt + rows[query_moves] - db_cnt
+            move = semiring.selection(src_cols, dst_cols, (shape[1], shape[1]))
+            new_front = semiring.add(new_front, semiring.matmul(prod_res, move))
         return new_front
 
-    symbols = db_fa.symbols.intersection(query_fa.symbols)
+    symbols = set(db_matrices.keys()).intersection(query_matrices.keys())
     all_transitions = [
-        block_diag((db_matrices[symb], query_matrices[symb])).transpose()
+        semiring.transpose(
+            semiring.block_diag(
+                [
+                    semiring.from_bool(db_matrices[symb]),
+                    semiring.from_bool(query_matrices[symb]),
+                ]
+            )
+        )
         for symb in symbols
     ]
 
+    def restore_query_states(front):
+        # only new entries are propagated, but moved columns still need their query state
+        rows, cols = semiring.nonzero(front)
+        cols = np.unique(cols[rows < db_cnt])
+        query_states = semiring.selection(db_cnt + cols % query_cnt, cols, shape)
+        return semiring.add(front, query_states)
+
     front = init_front()
-    reachable = front.copy()
-    prev_count = 0
-    while reachable.count_nonzero() != prev_count:
-        prev_count = reachable.count_nonzero()
-        front = step(front, all_transitions)
-        reachable += front
-
-    res = set()
-    db_states = {i: s for s, i in db_state_idx.items()}
-    for q_f in query_fa.final_states:
-        j = query_state_idx[q_f]
-        for i in range(db_cnt):
-            if reachable[i, j]:
-                res.add(db_states[i])
+    if nonempty_only:
+        front = restore_query_states(step(front, all_transitions))
+    reachable = front
+    while semiring.nnz(front) > 0:
+        front = semiring.improved(step(front, all_transitions), reachable)
+        front = restore_query_states(front)
+        reachable = semiring.add(reachable, front)
+
+    is_final = np.zeros(query_cnt, dtype=np.bool_)
+    is_final[query.final_idxs] = True
+    res = [set() for _ in range(groups_cnt)]
+    rows, cols = semiring.nonzero(reachable)
+    groups, query_states = np.divmod(cols, query_cnt)
+    for row, group, q_s in zip(rows, groups, query_states):
+        if row < db_cnt and is_final[q_s]:
+            res[group].add(int(row))
     return res
 
 
+def _find_reachable_from_groups(
+    db_fa: EpsilonNFA,
+    regex: str,
+    db_start_groups: List[Iterable[Any]],
+    semiring: Semiring,
+) -> List[Set[Any]]:
+    """
+    Multiple source BFS over db_fa and regex.
+    Return reachable states for every group of start states.
+    """
+    db_matrices, db_state_idx = get_bool_matrices_for_fa(db_fa)
+    db_states = {i: s for s, i in db_state_idx.items()}
+    res = _find_reachable_by_matrices(
+        db_matrices,
+        len(db_fa.states),
+        compile_query(regex),
+        [[db_state_idx[s] for s in group] for group in db_start_groups],
+        semiring,
+    )
+    return [{db_states[i] for i in group_res} for group_res in res]
+
+
+def find_reachable_in_fa_from_any(
+    db_fa: EpsilonNFA,
+    regex: str,
+    db_start_states: Iterable[Any],
+    backend: Union[str, None] = None,
+) -> Set[Any]:
+    """
+    Execute query regex to finite automaton.
+    Return all reachable states from given db_start_states.
+    Matrix operations are executed by given backend of boolean semiring, see project.semiring.
+    """
+    semiring = get_semiring("boolean", backend)
+    return _find_reachable_from_groups(db_fa, regex, [db_start_states], semiring)[0]
+
+
 def find_reachable_in_fa_from_each(
-    db_fa: EpsilonNFA, regex: str, db_start_states: Iterable[Any]
+    db_fa: EpsilonNFA,
+    regex: str,
+    db_start_states: Iterable[Any],
+    backend: Union[str, None] = None,
 ) -> Dict[Any, Set[Any]]:
     """
     Execute query regex to finite automaton.
     Return dict of all reachable states from each of given db_start_states.
+    All start states are processed by one multiple source BFS.
+    Matrix operations are executed by given backend of boolean semiring, see project.semiring.
     """
-    return {
-        start: find_reachable_in_fa_from_any(db_fa, regex, [start])
-        for start in db_start_states
-    }
+    starts = list(db_start_states)
+    if len(starts) == 0:
+        return dict()
+    semiring = get_semiring("boolean", backend)
+    groups = [[start] for start in starts]
+    res = _find_reachable_from_groups(db_fa, regex, groups, semiring)
+    return dict(zip(starts, res))
+
+
+def _find_reachable_in_graph(
+    db_graph: Union[nx.MultiDiGraph, LabeledGraph, str],
+    regex: str,
+    db_start_groups: List[Iterable[Any]],
+) -> List[Set[Any]]:
+    decomposition = get_graph_decomposition(db_graph)
+    res = _find_reachable_by_matrices(
+        decomposition.matrices,
+        len(decomposition.nodes),
+        compile_query(regex),
+        [[decomposition.nodes_idxs[s] for s in group] for group in db_start_groups],
+        get_semiring(),
+    )
+    return [{decomposition.nodes[i] for i in group_res} for group_res in res]
 
 
 def find_reachable_in_graph_from_any(
-    db_graph: nx.MultiDiGraph,
+    db_graph: Union[nx.MultiDiGraph, LabeledGraph, str],
     regex: str,
     db_start_states: Iterable[Any],
     db_final_states: Iterable[Any],
@@ -233,13 +788,12 @@ def find_reachable_in_graph_from_any(
     Execute query regex to graph.
     Return all reachable states from given db_start_states.
     """
-    db_fa = convert_nx_graph_to_nfa(db_graph)
-    states = find_reachable_in_fa_from_any(db_fa, regex, db_start_states)
+    states = _find_reachable_in_graph(db_graph, regex, [db_start_states])[0]
     return states.intersection(set(db_final_states))
 
 
 def find_reachable_in_graph_from_each(
-    db_graph: nx.MultiDiGraph,
+    db_graph: Union[nx.MultiDiGraph, LabeledGraph, str],
     regex: str,
     db_start_states: Iterable[Any],
     db_final_states: Iterable[Any],
@@ -247,8 +801,11 @@ def find_reachable_in_graph_from_each(
     """
     Execute query regex to graph.
     Return dict of all reachable states from each of given db_start_states.
+    All start states are processed by one multiple source BFS.
     """
-    db_fa = convert_nx_graph_to_nfa(db_graph)
-    res = find_reachable_in_fa_from_each(db_fa, regex, db_start_states)
+    starts = list(db_start_states)
+    if len(starts) == 0:
+        return dict()
+    res = _find_reachable_in_graph(db_graph, regex, [[start] for start in starts])
     final_set = set(db_final_states)
-    return {start: states.intersection(final_set) for start, states in res.items()}
+    return {start: states.intersection(final_set) for start, states in zip(starts, res)}
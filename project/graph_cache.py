@@ -0,0 +1,195 @@
+from hashlib import sha256
+import json
+import os
+import tempfile
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Sequence, Union
+import networkx as nx
+import numpy as np
+from pyformlang.finite_automaton import Epsilon, Symbol
+from scipy.sparse import csr_matrix
+
+from project.labeled_graph import NodeArray, NodeIndex
+
+# directory of the cache used by graph query functions, caching is disabled if it is None
+CACHE_DIR: Union[str, None] = os.environ.get("PROJECT_GRAPH_CACHE_DIR")
+
+# part of every entry name, must be increased when saved format or built decompositions change
+CACHE_FORMAT_VERSION = 2
+
+# types of node and label values that are saved to index.json and loaded unchanged
+_JSON_TYPES = (str, int, float, bool)
+
+
+class GraphDecomposition(NamedTuple):
+    """
+    Bool matrices of a graph for every label with index of every node
+    """
+
+    nodes: Sequence[Any]
+    nodes_idxs: Mapping[Any, int]
+    matrices: Dict[Any, csr_matrix]
+
+
+def graph_fingerprint(graph: nx.MultiDiGraph) -> str:
+    """
+    Get hash of nodes and labeled edges of the graph that does not depend on their order
+    """
+    digest = sha256()
+    for line in sorted(repr(node) for node in graph.nodes):
+        digest.update(line.encode())
+        digest.update(b"\n")
+    digest.update(b"\n")
+    for line in sorted(repr(edge) for edge in graph.edges(data="label")):
+        digest.update(line.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def file_key(path: str) -> str:
+    """
+    Get key of graph file by its absolute path, size and modification time without reading it
+    """
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}\n{stat.st_size}\n{stat.st_mtime_ns}"
+    return sha256(key.encode()).hexdigest()
+
+
+def entry_name(key: str) -> str:
+    return f"v{CACHE_FORMAT_VERSION}-{key}"
+
+
+def _int64_nodes(nodes) -> bool:
+    return isinstance(nodes, NodeArray) or all(
+        isinstance(node, (int, np.integer))
+        and not isinstance(node, bool)
+        and np.iinfo(np.int64).min <= node <= np.iinfo(np.int64).max
+        for node in nodes
+    )
+
+
+def can_save_decomposition(decomposition: GraphDecomposition) -> bool:
+    """
+    Check if save_decomposition can save nodes and labels of decomposition.
+    Nodes must be ints or JSON scalars, labels must be symbols with JSON scalar values.
+    """
+    return all(
+        isinstance(label, Symbol) and isinstance(label.value, _JSON_TYPES)
+        for label in decomposition.matrices
+    ) and (
+        _int64_nodes(decomposition.nodes)
+        or all(isinstance(node, _JSON_TYPES) for node in decomposition.nodes)
+    )
+
+
+def save_decomposition(path: str, decomposition: GraphDecomposition) -> None:
+    """
+    Save decomposition to directory path.
+    Index arrays of all matrices and int nodes are saved to .npy files, so they can be memory-mapped on load.
+    Other nodes and labels are saved to index.json, nothing is pickled.
+    Directory is written under temporary name and renamed, so readers never see a partial entry.
+    """
+    if not can_save_decomposition(decomposition):
+        raise TypeError(
+            "Only decompositions with int or JSON scalar nodes and labels can be saved"
+        )
+    n = len(decomposition.nodes)
+    labels, indptrs, indices = [], [], []
+    offset = 0
+    for label, matrix in decomposition.matrices.items():
+        labels.append([label.value, isinstance(label, Epsilon), offset, matrix.nnz])
+        indptrs.append(matrix.indptr)
+        indices.append(matrix.indices)
+        offset += matrix.nnz
+    # scipy keeps index arrays without copying only if they have the dtype it would choose
+    dtype = np.int32 if max(offset, n) < np.iinfo(np.int32).max else np.int64
+    int_nodes = _int64_nodes(decomposition.nodes)
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=parent)
+    np.save(
+        os.path.join(tmp_path, "indptr.npy"),
+        np.concatenate(indptrs).astype(dtype) if indptrs else np.zeros(0, dtype),
+    )
+    np.save(
+        os.path.join(tmp_path, "indices.npy"),
+        np.concatenate(indices).astype(dtype) if indices else np.zeros(0, dtype),
+    )
+    if int_nodes:
+        np.save(
+            os.path.join(tmp_path, "nodes.npy"),
+            np.array(decomposition.nodes, dtype=np.int64).reshape(n),
+        )
+    index = {
+        "n": n,
+        "nodes": None if int_nodes else list(decomposition.nodes),
+        "labels": labels,
+    }
+    with open(os.path.join(tmp_path, "index.json"), "w") as f:
+        json.dump(index, f)
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # entry was saved by another process
+        for name in os.listdir(tmp_path):
+            os.remove(os.path.join(tmp_path, name))
+        os.rmdir(tmp_path)
+
+
+def load_decomposition(path: str) -> GraphDecomposition:
+    """
+    Load decomposition saved by save_decomposition, index arrays and int nodes are memory-mapped
+    """
+    with open(os.path.join(path, "index.json")) as f:
+        index = json.load(f)
+    n = index["n"]
+    indptr = np.load(os.path.join(path, "indptr.npy"), mmap_mode="r")
+    indices = np.load(os.path.join(path, "indices.npy"), mmap_mode="r")
+    matrices = dict()
+    for k, (value, is_epsilon, offset, nnz) in enumerate(index["labels"]):
+        label_indptr = indptr[k * (n + 1) : (k + 1) * (n + 1)]
+        label = Epsilon() if is_epsilon else Symbol(value)
+        matrices[label] = csr_matrix(
+            (
+                np.ones(nnz, dtype=np.bool_),
+                indices[offset : offset + nnz],
+                label_indptr,
+            ),
+            shape=(n, n),
+            copy=False,
+        )
+    if index["nodes"] is None:
+        nodes = NodeArray(np.load(os.path.join(path, "nodes.npy"), mmap_mode="r"))
+        return GraphDecomposition(nodes, NodeIndex(nodes), matrices)
+    nodes = index["nodes"]
+    nodes_idxs = {node: i for i, node in enumerate(nodes)}
+    return GraphDecomposition(nodes, nodes_idxs, matrices)
+
+
+def get_cached_decomposition(
+    graph: Any,
+    build: Callable[[Any], GraphDecomposition],
+    cache_dir: Union[str, None] = None,
+    key: Union[str, None] = None,
+) -> GraphDecomposition:
+    """
+    Get decomposition of the graph from cache_dir, or build it and save to cache_dir.
+    Entries are keyed by key, by default by graph_fingerprint of networkx graph.
+    Fingerprint hashes every edge, so callers that know a cheaper key, like file_key, should pass it.
+    By default, module level CACHE_DIR is used, if it is None, decomposition is built without caching.
+    Decompositions that can not be saved, see can_save_decomposition, are not cached.
+    """
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+    if cache_dir is None:
+        return build(graph)
+
+    if key is None:
+        key = graph_fingerprint(graph)
+    path = os.path.join(cache_dir, entry_name(key))
+    if os.path.isdir(path):
+        return load_decomposition(path)
+    decomposition = build(graph)
+    if can_save_decomposition(decomposition):
+        save_decomposition(path, decomposition)
+    return decomposition
@@ -1,24 +1,60 @@
-from typing import Set, NamedTuple, Tuple
+from array import array
+import json
+import re
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Set, NamedTuple, Tuple, Union
 import cfpq_data
 import networkx as nx
 import networkx.drawing.nx_pydot as nx_pydot
+import numpy as np
+import pandas as pd
 
+from project.labeled_graph import LabeledGraph, NodeArray
 
-def _load_graph(name: str) -> nx.MultiDiGraph:
-    path = cfpq_data.download(name)
-    return cfpq_data.graph_from_csv(path)
+# number of edges parsed at once by read_labeled_graph
+CHUNK_SIZE = 1_000_000
 
 
-def _get_graph_vertexes_number(gr: nx.MultiDiGraph) -> int:
-    return gr.number_of_nodes()
-
-
-def _get_graph_edges_number(gr: nx.MultiDiGraph) -> int:
-    return gr.number_of_edges()
-
+def read_labeled_graph(path: str, chunk_size: int = CHUNK_SIZE) -> LabeledGraph:
+    """
+    Read local edge list file in cfpq_data CSV format ("from to label" separated by spaces)
+    to LabeledGraph. File is parsed by chunks of chunk_size edges directly to NumPy arrays.
+    Edges without label are skipped like in LabeledGraph.from_networkx, their nodes are kept.
+    """
+    labels_idxs: Dict[Any, int] = dict()
+    srcs, dsts, label_ids, unlabeled = [], [], [], []
+    chunks = pd.read_csv(
+        path,
+        sep=" ",
+        header=None,
+        names=["from", "to", "label"],
+        engine="c",
+        chunksize=chunk_size,
+    )
+    for chunk in chunks:
+        codes, uniques = pd.factorize(chunk["label"])
+        chunk_ids = np.array(
+            [labels_idxs.setdefault(label, len(labels_idxs)) for label in uniques],
+            dtype=np.int64,
+        )
+        # factorize gives code -1 to missing labels
+        labeled = codes >= 0
+        src, dst = chunk["from"].to_numpy(), chunk["to"].to_numpy()
+        srcs.append(src[labeled])
+        dsts.append(dst[labeled])
+        label_ids.append(chunk_ids[codes[labeled]])
+        unlabeled.append(src[~labeled])
+        unlabeled.append(dst[~labeled])
 
-def _get_graph_unique_labels(gr: nx.MultiDiGraph) -> Set[str]:
-    return {data["label"] for (_, _, data) in gr.edges(data=True)}
+    if len(srcs) == 0:
+        srcs = dsts = label_ids = unlabeled = [np.zeros(0, dtype=np.int64)]
+    return LabeledGraph.from_edge_arrays(
+        np.concatenate(srcs),
+        np.concatenate(dsts),
+        np.concatenate(label_ids),
+        list(labels_idxs),
+        np.concatenate(unlabeled),
+    )
 
 
 GraphInfo = NamedTuple(
@@ -27,19 +63,224 @@ GraphInfo = NamedTuple(
 )
 
 
-def get_graph_info(name: str) -> GraphInfo:
-    """Return tuple of vertex count, edges count and unique labels of graph from cfpq_data repository by name"""
-    graph = _load_graph(name)
+def get_labeled_graph_info(graph: LabeledGraph) -> GraphInfo:
+    """Return tuple of vertex count, edges count and unique labels of LabeledGraph"""
     return GraphInfo(
-        vertexes_count=_get_graph_vertexes_number(graph),
-        edges_count=_get_graph_edges_number(graph),
-        unique_labels=_get_graph_unique_labels(graph),
+        vertexes_count=graph.number_of_nodes(),
+        edges_count=graph.number_of_edges(),
+        unique_labels=graph.unique_labels(),
     )
 
 
+def get_graph_info_from_file(path: str) -> GraphInfo:
+    """Return tuple of vertex count, edges count and unique labels of graph from local edge list file"""
+    return get_labeled_graph_info(read_labeled_graph(path))
+
+
+def get_graph_info(name: str) -> GraphInfo:
+    """Return tuple of vertex count, edges count and unique labels of graph from cfpq_data repository by name"""
+    return get_graph_info_from_file(cfpq_data.download(name))
+
+
 def save_labeled_two_cycles_graph(
     n: int, m: int, labels: Tuple[str, str], path: str
 ) -> None:
     """Create labeled two cycles graph with n and m vertexes and save it to path"""
     gr = cfpq_data.labeled_two_cycles_graph(n, m, labels=labels)
     nx_pydot.write_dot(gr, path)
+
+
+# binary graph file: magic, version and metadata length, JSON metadata padded to 8 bytes,
+# then label_ptr (labels+1, int64), src and indices of edges and integer node values if nodes are integers
+_GRAPH_FILE_MAGIC = b"CFPQGRPH"
+_GRAPH_FILE_VERSION = 2
+_GRAPH_FILE_HEADER = 24
+
+
+def save_labeled_graph(graph: Union[nx.MultiDiGraph, LabeledGraph], path: str) -> None:
+    """Save graph to binary file with label dictionary and edges sorted by label and source"""
+    if not isinstance(graph, LabeledGraph):
+        graph = LabeledGraph.from_networkx(graph)
+    int_nodes = isinstance(graph.nodes, NodeArray) or all(
+        isinstance(node, (int, np.integer)) and not isinstance(node, bool)
+        for node in graph.nodes
+    )
+    if not int_nodes and not all(isinstance(node, str) for node in graph.nodes):
+        raise TypeError("Only graphs with integer or string nodes can be saved")
+    meta = {
+        "labels": list(graph.labels),
+        "nodes": None if int_nodes else list(graph.nodes),
+        "n_nodes": len(graph.nodes),
+        "n_edges": graph.number_of_edges(),
+        "indices_dtype": graph.indices.dtype.str,
+    }
+    meta_bytes = json.dumps(meta).encode()
+    meta_bytes += b" " * (-len(meta_bytes) % 8)
+    with open(path, "wb") as f:
+        f.write(_GRAPH_FILE_MAGIC)
+        f.write(struct.pack("<QQ", _GRAPH_FILE_VERSION, len(meta_bytes)))
+        f.write(meta_bytes)
+        f.write(np.ascontiguousarray(graph.label_ptr, dtype="<i8").tobytes())
+        for array in (graph.src, graph.indices):
+            array = np.ascontiguousarray(array, dtype=graph.indices.dtype)
+            f.write(array.tobytes())
+            f.write(b"\0" * (-array.nbytes % 8))
+        if int_nodes:
+            f.write(np.array(graph.nodes, dtype="<i8").tobytes())
+
+
+def is_labeled_graph_file(path: str) -> bool:
+    """Check if path is a binary graph file written by save_labeled_graph"""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(_GRAPH_FILE_MAGIC)) == _GRAPH_FILE_MAGIC
+    except OSError:
+        return False
+
+
+def load_labeled_graph(path: str) -> LabeledGraph:
+    """Load graph saved by save_labeled_graph, edge arrays and int nodes are memory-mapped instead of read"""
+    with open(path, "rb") as f:
+        header = f.read(_GRAPH_FILE_HEADER)
+        if header[: len(_GRAPH_FILE_MAGIC)] != _GRAPH_FILE_MAGIC:
+            raise ValueError(f"'{path}' is not a binary graph file")
+        version, meta_len = struct.unpack("<QQ", header[len(_GRAPH_FILE_MAGIC) :])
+        if version != _GRAPH_FILE_VERSION:
+            raise ValueError(f"Unsupported version {version} of graph file '{path}'")
+        meta = json.loads(f.read(meta_len))
+
+    n, n_labels, n_edges = meta["n_nodes"], len(meta["labels"]), meta["n_edges"]
+    indices_dtype = np.dtype(meta["indices_dtype"])
+    offset = _GRAPH_FILE_HEADER + meta_len
+
+    def mapped(dtype, shape):
+        nonlocal offset
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        if size == 0:
+            array = np.zeros(shape, dtype=dtype)
+        else:
+            array = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape)
+        offset += size + (-size % 8)
+        return array
+
+    label_ptr = mapped("<i8", (n_labels + 1,))
+    src = mapped(indices_dtype, (n_edges,))
+    indices = mapped(indices_dtype, (n_edges,))
+    nodes = meta["nodes"]
+    if nodes is None:
+        nodes = NodeArray(mapped("<i8", (n,)))
+    return LabeledGraph(nodes, meta["labels"], label_ptr, src, indices)
+
+
+_DOT_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|-?[\w.]+|->|--|[\[\]{};,=]')
+
+
+def _dot_tokens(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        if line.lstrip().startswith(("#", "//")):
+            continue
+        yield from _DOT_TOKEN.findall(line)
+
+
+def _dot_id(token: str) -> str:
+    if token.startswith('"'):
+        return token[1:-1].replace('\\"', '"')
+    return token
+
+
+def read_dot_labeled_graph(path: str) -> LabeledGraph:
+    """Read DOT digraph with labeled edges to LabeledGraph streaming the file line by line.
+    Node, edge and attribute statements as written by pydot are supported, node values are strings,
+    edges without label are skipped"""
+    nodes_idxs: Dict[str, int] = dict()
+    labels_idxs: Dict[str, int] = dict()
+    src, dst, label_ids = array("q"), array("q"), array("q")
+
+    with open(path) as f:
+        tokens = _dot_tokens(f)
+        pending: List[str] = []
+
+        def next_token() -> str:
+            if pending:
+                return pending.pop()
+            token = next(tokens, None)
+            if token is None:
+                raise ValueError(f"Unexpected end of DOT file '{path}'")
+            return token
+
+        def read_attrs() -> Dict[str, str]:
+            attrs = dict()
+            token = next_token()
+            while token != "]":
+                if token != ",":
+                    if next_token() != "=":
+                        raise ValueError(f"Expected '=' after attribute '{token}'")
+                    attrs[_dot_id(token)] = _dot_id(next_token())
+                token = next_token()
+            return attrs
+
+        token = next_token()
+        if token == "strict":
+            token = next_token()
+        if token != "digraph":
+            raise ValueError(f"Only digraph is supported, got '{token}'")
+        token = next_token()
+        if token != "{":
+            token = next_token()
+        if token != "{":
+            raise ValueError(f"Expected '{{' after digraph, got '{token}'")
+
+        token = next_token()
+        while token != "}":
+            if token in ("node", "edge", "graph"):
+                if next_token() != "[":
+                    raise ValueError(f"Expected attributes after '{token}'")
+                read_attrs()
+            elif token not in (";", ","):
+                if token in ("{", "}", "[", "]", "=", "->", "--"):
+                    raise ValueError(
+                        f"Unsupported DOT statement starting with '{token}'"
+                    )
+                name = _dot_id(token)
+                token = next_token()
+                if token == "=":
+                    # graph attribute
+                    next_token()
+                    token = next_token()
+                    continue
+                u = nodes_idxs.setdefault(name, len(nodes_idxs))
+                if token == "->":
+                    v = nodes_idxs.setdefault(_dot_id(next_token()), len(nodes_idxs))
+                    token = next_token()
+                    attrs = dict()
+                    if token == "[":
+                        attrs = read_attrs()
+                    else:
+                        pending.append(token)
+                    label = attrs.get("label")
+                    if label is not None:
+                        src.append(u)
+                        dst.append(v)
+                        label_ids.append(
+                            labels_idxs.setdefault(label, len(labels_idxs))
+                        )
+                elif token == "[":
+                    read_attrs()
+                else:
+                    pending.append(token)
+            token = next_token()
+
+    return LabeledGraph.from_indexed_edges(
+        list(nodes_idxs),
+        list(labels_idxs),
+        np.frombuffer(src, dtype=np.int64),
+        np.frombuffer(dst, dtype=np.int64),
+        np.frombuffer(label_ids, dtype=np.int64),
+    )
+
+
+def read_graph(path: str) -> LabeledGraph:
+    """Read graph from binary graph file written by save_labeled_graph or from DOT file"""
+    if is_labeled_graph_file(path):
+        return load_labeled_graph(path)
+    return read_dot_labeled_graph(path)
@@ -0,0 +1,303 @@
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterator, List, Set, Tuple, Union
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# number of nodes converted to Python ints at once when NodeArray is iterated
+NODES_CHUNK = 1 << 16
+
+_INT64_MIN, _INT64_MAX = int(np.iinfo(np.int64).min), int(np.iinfo(np.int64).max)
+
+
+class LabelMatrices(Mapping):
+    """
+    Read-only mapping of labels to bool adjacency matrices of LabeledGraph.
+    Matrices are built on first access, so only used labels keep CSR indptr of n + 1 entries.
+    """
+
+    def __init__(self, graph: "LabeledGraph", keys: List[Any]):
+        self._graph = graph
+        self._keys: Dict[Any, int] = {key: i for i, key in enumerate(keys)}
+        self._matrices: Dict[Any, csr_matrix] = dict()
+
+    def __getitem__(self, key) -> csr_matrix:
+        if key not in self._matrices:
+            self._matrices[key] = self._graph.label_matrix(self._keys[key])
+        return self._matrices[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class NodeArray(Sequence):
+    """
+    Read-only sequence of int nodes kept in NumPy array, for example memory-mapped from graph file.
+    Nodes are converted to Python ints only when they are accessed.
+    """
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return NodeArray(self.array[i])
+        return int(self.array[i])
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __iter__(self) -> Iterator[int]:
+        for start in range(0, len(self.array), NODES_CHUNK):
+            yield from self.array[start : start + NODES_CHUNK].tolist()
+
+    def __contains__(self, node) -> bool:
+        return _is_int64(node) and bool(np.any(self.array == node))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, NodeArray):
+            return np.array_equal(self.array, other.array)
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and list(self) == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        return np.asarray(self.array, dtype=dtype)
+
+    def index(self, node, start: int = 0, stop: Union[int, None] = None) -> int:
+        if _is_int64(node):
+            found = np.flatnonzero(self.array[start:stop] == node)
+            if len(found) > 0:
+                return start + int(found[0])
+        raise ValueError(f"{node!r} is not in nodes")
+
+
+def _is_int64(node) -> bool:
+    return (
+        isinstance(node, (int, np.integer))
+        and not isinstance(node, bool)
+        and _INT64_MIN <= node <= _INT64_MAX
+    )
+
+
+class NodeIndex(Mapping):
+    """
+    Read-only mapping of int nodes of NodeArray to their indexes.
+    Nodes are looked up by binary search in sorted copy of the array instead of dict.
+    """
+
+    def __init__(self, nodes: NodeArray):
+        self._nodes = nodes
+        self._order = np.argsort(nodes.array, kind="stable")
+        self._sorted = nodes.array[self._order]
+
+    def __getitem__(self, node) -> int:
+        if _is_int64(node):
+            pos = int(np.searchsorted(self._sorted, node))
+            if pos < len(self._sorted) and self._sorted[pos] == node:
+                return int(self._order[pos])
+        raise KeyError(node)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+
+class LabeledGraph:
+    """
+    Labeled directed multigraph stored in NumPy arrays.
+    Nodes are remapped to indexes 0..n-1 and labels are interned to ids.
+    Edges are sorted by (label id, source, target): edges with label id l are
+    src[label_ptr[l] : label_ptr[l + 1]] -> indices[label_ptr[l] : label_ptr[l + 1]],
+    so memory does not depend on the number of labels times the number of nodes.
+    nodes is a list, or NodeArray for int nodes of graph loaded from binary file.
+    """
+
+    __slots__ = ("nodes", "labels", "label_ptr", "src", "indices")
+
+    def __init__(
+        self,
+        nodes: Union[List[Any], NodeArray],
+        labels: List[Any],
+        label_ptr: np.ndarray,
+        src: np.ndarray,
+        indices: np.ndarray,
+    ):
+        self.nodes: Union[List[Any], NodeArray] = nodes
+        self.labels: List[Any] = labels
+        self.label_ptr: np.ndarray = label_ptr
+        self.src: np.ndarray = src
+        self.indices: np.ndarray = indices
+
+    @staticmethod
+    def from_indexed_edges(
+        nodes: List[Any],
+        labels: List[Any],
+        src: np.ndarray,
+        dst: np.ndarray,
+        label_ids: np.ndarray,
+    ) -> "LabeledGraph":
+        """
+        Create graph from arrays of source and target node indexes and label ids
+        """
+        label_ids = np.asarray(label_ids, dtype=np.int64)
+        src, dst = np.asarray(src), np.asarray(dst)
+        order = np.lexsort((dst, src, label_ids))
+        counts = np.bincount(label_ids, minlength=len(labels))
+        index_dtype = np.int32 if len(nodes) < np.iinfo(np.int32).max else np.int64
+        return LabeledGraph(
+            nodes,
+            labels,
+            np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            src[order].astype(index_dtype),
+            dst[order].astype(index_dtype),
+        )
+
+    @staticmethod
+    def from_edge_arrays(
+        src: np.ndarray,
+        dst: np.ndarray,
+        label_ids: np.ndarray,
+        labels: List[Any],
+        extra_nodes: Union[np.ndarray, None] = None,
+    ) -> "LabeledGraph":
+        """
+        Create graph from arrays of source and target node values and label ids.
+        Nodes are indexed in sorted order of their values, extra_nodes are added without edges.
+        """
+        values = [src, dst] if extra_nodes is None else [src, dst, extra_nodes]
+        nodes, idxs = np.unique(np.concatenate(values), return_inverse=True)
+        idxs = idxs.astype(np.int64)
+        return LabeledGraph.from_indexed_edges(
+            nodes.tolist(),
+            list(labels),
+            idxs[: len(src)],
+            idxs[len(src) : len(src) + len(dst)],
+            label_ids,
+        )
+
+    @staticmethod
+    def from_networkx(graph: nx.MultiDiGraph) -> "LabeledGraph":
+        """
+        Create graph from networkx graph with "label" attribute of edges,
+        edges without label are skipped
+        """
+        nodes = list(graph.nodes)
+        nodes_idxs = {node: i for i, node in enumerate(nodes)}
+        labels_idxs: Dict[Any, int] = dict()
+        src, dst, label_ids = [], [], []
+        for u, v, label in graph.edges(data="label"):
+            if label is None:
+                continue
+            src.append(nodes_idxs[u])
+            dst.append(nodes_idxs[v])
+            label_ids.append(labels_idxs.setdefault(label, len(labels_idxs)))
+        return LabeledGraph.from_indexed_edges(
+            nodes,
+            list(labels_idxs),
+            np.array(src, dtype=np.int64),
+            np.array(dst, dtype=np.int64),
+            np.array(label_ids, dtype=np.int64),
+        )
+
+    def to_networkx(self) -> nx.MultiDiGraph:
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(self.nodes)
+        graph.add_edges_from(
+            (u, v, {"label": label}) for u, v, label in self.edges(data="label")
+        )
+        return graph
+
+    @property
+    def dst(self) -> np.ndarray:
+        """
+        Target node index of every edge
+        """
+        return self.indices.astype(np.int64)
+
+    @property
+    def label_ids(self) -> np.ndarray:
+        """
+        Label id of every edge
+        """
+        return np.repeat(np.arange(len(self.labels)), np.diff(self.label_ptr))
+
+    def _node_values(self, idxs: np.ndarray) -> List[Any]:
+        if isinstance(self.nodes, NodeArray):
+            return self.nodes.array[idxs].tolist()
+        return [self.nodes[i] for i in idxs.tolist()]
+
+    def node_index(self) -> Mapping:
+        """
+        Get mapping of every node to its index
+        """
+        if isinstance(self.nodes, NodeArray):
+            return NodeIndex(self.nodes)
+        return {node: i for i, node in enumerate(self.nodes)}
+
+    def number_of_nodes(self) -> int:
+        return len(self.nodes)
+
+    def number_of_edges(self) -> int:
+        return len(self.indices)
+
+    def unique_labels(self) -> Set[Any]:
+        """
+        Get labels that are used by at least one edge
+        """
+        counts = np.diff(self.label_ptr)
+        return {label for label, count in zip(self.labels, counts) if count > 0}
+
+    def edges(
+        self, data: Union[str, bool] = False
+    ) -> Iterator[Union[Tuple[Any, Any], Tuple[Any, Any, Any]]]:
+        """
+        Iterate over edges as (u, v) pairs, or as (u, v, label) triples with data="label"
+        like networkx graph does
+        """
+        label_ids = self.label_ids
+        for start in range(0, len(self.indices), NODES_CHUNK):
+            end = start + NODES_CHUNK
+            us = self._node_values(self.src[start:end])
+            vs = self._node_values(self.indices[start:end])
+            if data == "label":
+                for u, v, label_id in zip(us, vs, label_ids[start:end].tolist()):
+                    yield u, v, self.labels[label_id]
+            else:
+                yield from zip(us, vs)
+
+    def label_matrix(self, label_id: int) -> csr_matrix:
+        """
+        Get bool adjacency matrix of the label with label_id.
+        Indices are shared with the graph unless there are parallel edges with the same label.
+        """
+        n = len(self.nodes)
+        start, end = self.label_ptr[label_id], self.label_ptr[label_id + 1]
+        counts = np.bincount(self.src[start:end], minlength=n)
+        matrix = csr_matrix(
+            (
+                np.ones(end - start, dtype=np.bool_),
+                self.indices[start:end],
+                np.concatenate([[0], np.cumsum(counts)]).astype(self.indices.dtype),
+            ),
+            shape=(n, n),
+        )
+        if not matrix.has_canonical_format:
+            # summing is done in place, so indices of the graph are copied first
+            matrix = matrix.copy()
+            matrix.sum_duplicates()
+        return matrix
+
+    def label_matrices(self, keys: Union[List[Any], None] = None) -> LabelMatrices:
+        """
+        Get mapping of every label to its bool adjacency matrix, matrices are built on access.
+        keys replace labels as keys of the mapping if they are given.
+        """
+        return LabelMatrices(self, self.labels if keys is None else keys)
@@ -0,0 +1,233 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing.util import Finalize
+import os
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Set, Tuple, Union
+from pyformlang.finite_automaton import Symbol
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from project.finite_automata_utils import (
+    _find_reachable_by_matrices,
+    compile_query,
+    get_graph_decomposition,
+)
+from project.labeled_graph import LabeledGraph
+from project.semiring import get_semiring
+
+# every worker gets several tasks, so slow partitions do not keep other workers idle
+TASKS_PER_WORKER = 4
+
+# (shared memory name, number of nodes, total size, [(label, offset of indptr, nnz)])
+_Layout = Tuple[str, int, int, List[Tuple[Symbol, int, int]]]
+
+# shared memory, number of nodes and matrices attached by the current worker process
+_worker_state: Tuple[Union[SharedMemory, None], int, Dict[Symbol, csr_matrix]] = (
+    None,
+    0,
+    dict(),
+)
+
+
+def _share_matrices(
+    matrices: Dict[Symbol, csr_matrix], n: int
+) -> Tuple[SharedMemory, _Layout]:
+    """
+    Copy indptr and indices of all matrices to one block of shared memory
+    """
+    labels = []
+    offset = 0
+    for label, matrix in matrices.items():
+        labels.append((label, offset, matrix.nnz))
+        offset += n + 1 + matrix.nnz
+
+    memory = SharedMemory(create=True, size=max(offset, 1) * 8)
+    try:
+        buffer = np.ndarray((offset,), dtype=np.int64, buffer=memory.buf)
+        for label, start, nnz in labels:
+            buffer[start : start + n + 1] = matrices[label].indptr
+            buffer[start + n + 1 : start + n + 1 + nnz] = matrices[label].indices
+        del buffer
+    except BaseException:
+        _release(memory)
+        raise
+    return memory, (memory.name, n, offset, labels)
+
+
+def _release(memory: SharedMemory) -> None:
+    memory.close()
+    memory.unlink()
+
+
+def _attach_matrices(layout: _Layout) -> None:
+    """
+    Worker initializer: build matrices over shared memory without copying,
+    shared memory is closed by _detach_matrices when the worker exits
+    """
+    global _worker_state
+    name, n, size, labels = layout
+    memory = SharedMemory(name=name)
+    buffer = np.ndarray((size,), dtype=np.int64, buffer=memory.buf)
+    matrices = dict()
+    for label, start, nnz in labels:
+        indptr = buffer[start : start + n + 1]
+        indices = buffer[start + n + 1 : start + n + 1 + nnz]
+        data = np.ones(nnz, dtype=np.bool_)
+        matrices[label] = csr_matrix((data, indices, indptr), shape=(n, n), copy=False)
+    _worker_state = (memory, n, matrices)
+    Finalize(None, _detach_matrices, exitpriority=10)
+
+
+def _detach_matrices() -> None:
+    """
+    Drop matrices of the current worker process and close its handle of shared memory
+    """
+    global _worker_state
+    memory = _worker_state[0]
+    _worker_state = (None, 0, dict())
+    if memory is not None:
+        memory.close()
+
+
+def _reachable_task(
+    regex: str, starts: List[int], nonempty_only: bool, backend: Union[str, None]
+) -> List[Set[int]]:
+    _, n, matrices = _worker_state
+    return _find_reachable_by_matrices(
+        matrices,
+        n,
+        compile_query(regex),
+        [[start] for start in starts],
+        get_semiring("boolean", backend),
+        nonempty_only,
+    )
+
+
+class ParallelRPQExecutor:
+    """
+    Pool of worker processes answering regular path queries over one graph.
+    Bool decomposition of the graph is placed to shared memory once and is read by all workers.
+    Start nodes of every query are partitioned across workers and their results are merged.
+    Use it as a context manager or call close() to release processes and shared memory.
+    """
+
+    def __init__(
+        self,
+        db_graph: Union[nx.MultiDiGraph, LabeledGraph, str],
+        processes: Union[int, None] = None,
+        backend: Union[str, None] = None,
+    ):
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        if self.processes < 1:
+            raise ValueError(
+                f"Number of processes must be positive, got {self.processes}"
+            )
+        self.backend = backend
+        decomposition = get_graph_decomposition(db_graph)
+        self.nodes: Sequence[Any] = decomposition.nodes
+        self.nodes_idxs: Mapping[Any, int] = decomposition.nodes_idxs
+        self._memory, layout = _share_matrices(decomposition.matrices, len(self.nodes))
+        try:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.processes,
+                initializer=_attach_matrices,
+                initargs=(layout,),
+            )
+        except BaseException:
+            _release(self._memory)
+            raise
+
+    def close(self) -> None:
+        self._pool.shutdown()
+        _release(self._memory)
+
+    def __enter__(self) -> "ParallelRPQExecutor":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def _reachable(
+        self, regex: str, starts: List[Any], nonempty_only: bool
+    ) -> Dict[Any, Set[Any]]:
+        if len(starts) == 0:
+            return dict()
+        idxs = np.array([self.nodes_idxs[s] for s in starts], dtype=np.int64)
+        n_tasks = min(len(idxs), self.processes * TASKS_PER_WORKER)
+        parts = [p.tolist() for p in np.array_split(idxs, n_tasks) if len(p) > 0]
+        tasks = [
+            self._pool.submit(_reachable_task, regex, p, nonempty_only, self.backend)
+            for p in parts
+        ]
+        res = dict()
+        for part, task in zip(parts, tasks):
+            for start, reached in zip(part, task.result()):
+                res[self.nodes[start]] = {self.nodes[i] for i in reached}
+        return res
+
+    def query_regex_with_states(
+        self,
+        query: str,
+        start_states: Union[Iterable[Any], None] = None,
+        final_states: Union[Iterable[Any], None] = None,
+    ) -> Set[Tuple[Any, Any]]:
+        """
+        Same as query_regex_to_fa_with_states for the graph of the executor.
+        Return all pairs of start and final nodes connected by nonempty path corresponding to the regex.
+        """
+        starts = list(self.nodes if start_states is None else set(start_states))
+        finals = set(self.nodes if final_states is None else final_states)
+        res = self._reachable(query, starts, nonempty_only=True)
+        return {
+            (start, final)
+            for start, reached in res.items()
+            for final in reached.intersection(finals)
+        }
+
+    def find_reachable_from_each(
+        self,
+        regex: str,
+        db_start_states: Iterable[Any],
+        db_final_states: Iterable[Any],
+    ) -> Dict[Any, Set[Any]]:
+        """
+        Same as find_reachable_in_graph_from_each for the graph of the executor.
+        Return dict of all reachable final nodes from each of given db_start_states.
+        """
+        starts = list(dict.fromkeys(db_start_states))
+        finals = set(db_final_states)
+        res = self._reachable(regex, starts, nonempty_only=False)
+        return {start: reached.intersection(finals) for start, reached in res.items()}
+
+
+def query_regex_to_fa_with_states(
+    db_graph: Union[nx.MultiDiGraph, LabeledGraph, str],
+    query: str,
+    start_states: Union[Iterable[Any], None] = None,
+    final_states: Union[Iterable[Any], None] = None,
+    processes: Union[int, None] = None,
+) -> Set[Tuple[Any, Any]]:
+    """
+    Multi-process version of finite_automata_utils.query_regex_to_fa_with_states.
+    By default, one process per CPU is used.
+    """
+    with ParallelRPQExecutor(db_graph, processes) as executor:
+        return executor.query_regex_with_states(query, start_states, final_states)
+
+
+def find_reachable_in_graph_from_each(
+    db_graph: Union[nx.MultiDiGraph, LabeledGraph, str],
+    regex: str,
+    db_start_states: Iterable[Any],
+    db_final_states: Iterable[Any],
+    processes: Union[int, None] = None,
+) -> Dict[Any, Set[Any]]:
+    """
+    Multi-process version of finite_automata_utils.find_reachable_in_graph_from_each.
+    By default, one process per CPU is used.
+    """
+    with ParallelRPQExecutor(db_graph, processes) as executor:
+        return executor.find_reachable_from_each(
+            regex, db_start_states, db_final_states
+        )
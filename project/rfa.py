@@ -1,35 +1,110 @@
-from typing import Any, Dict, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, NamedTuple, Tuple
+import numpy as np
 from pyformlang.cfg import CFG, Variable
 from pyformlang.finite_automaton import EpsilonNFA, State, Symbol
 from project.ecfg import ECFG
 from scipy.sparse import csr_matrix
 
-from project.finite_automata_utils import get_bool_matrices_for_fa
+from project.dfa_table import (
+    DFATable,
+    IntNFA,
+    determinize,
+    dfa_table_to_dfa,
+    fa_to_int_nfa,
+    minimize_dfa_table,
+)
+from project.finite_automata_utils import build_bool_matrices
+
+RFAMatrices = NamedTuple(
+    "RFAMatrices",
+    [
+        ("matrices", Dict[Symbol, csr_matrix]),
+        ("states_idxs", Dict[Tuple[Variable, State], int]),
+        ("start_states", Dict[Variable, np.ndarray]),
+        ("final_states", Dict[Variable, np.ndarray]),
+    ],
+)
+
+
+def _minimize_box(nfa: IntNFA) -> DFATable:
+    return minimize_dfa_table(determinize(*nfa))
 
 
 class RFA:
     def __init__(self):
         self.ecfg: Any[ECFG, None] = None
         self.fa_dict: Dict[Variable, EpsilonNFA] = dict()
+        self._matrices: Any[RFAMatrices, None] = None
 
-    def minimize(self) -> "RFA":
+    def minimize(self, processes: int = 1) -> "RFA":
         """
         Minimize finite automatons for every production
+        Boxes are converted to integer transition tables and minimized by Hopcroft algorithm
+        of project.dfa_table, the same one that minimizes query DFAs,
+        states of every minimized box are numbered 0..n-1 from its start state.
+        With processes > 1, boxes are minimized by a pool of worker processes.
         Return minimized RFA
         """
+        if processes < 1:
+            raise ValueError(f"Number of processes must be positive, got {processes}")
+        nfas = [fa_to_int_nfa(fa) for fa in self.fa_dict.values()]
+        if processes == 1:
+            tables = [_minimize_box(nfa) for nfa in nfas]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                tables = list(executor.map(_minimize_box, nfas))
+
         rfa = RFA()
         rfa.ecfg = self.ecfg
-        rfa.fa_dict = {var: fa.minimize() for var, fa in self.fa_dict.items()}
+        rfa.fa_dict = {
+            var: dfa_table_to_dfa(table) for var, table in zip(self.fa_dict, tables)
+        }
         return rfa
 
-    def to_matrices(
-        self,
-    ) -> Dict[Variable, Tuple[Dict[Symbol, csr_matrix], Dict[State, int]]]:
+    def to_matrices(self) -> RFAMatrices:
         """
-        Get bool matrices of finite automatons for every production
-        Return matrices for every symbol and indexes of every state
+        Get bool decomposition of all finite automatons at once
+        Every state of every box gets one global index, so matrices for every symbol are block matrices.
+        Start and final states of every box are returned as bool vectors over global indexes.
+        Epsilon transitions of boxes are removed beforehand.
+        The decomposition is built once and cached, so fa_dict must not be changed afterwards.
         """
-        return {var: get_bool_matrices_for_fa(var) for var in self.fa_dict.keys()}
+        if self._matrices is None:
+            self._matrices = self._build_matrices()
+        return self._matrices
+
+    def _build_matrices(self) -> RFAMatrices:
+        boxes = {
+            var: fa.remove_epsilon_transitions() for var, fa in self.fa_dict.items()
+        }
+        states_idxs = dict()
+        for var, fa in boxes.items():
+            for state in fa.states:
+                states_idxs[(var, state)] = len(states_idxs)
+
+        n = len(states_idxs)
+        matrices = build_bool_matrices(
+            (
+                (states_idxs[(var, s_from)], symb, states_idxs[(var, s_to)])
+                for var, fa in boxes.items()
+                for s_from, symb, s_to in fa
+            ),
+            n,
+        )
+
+        def get_states_vector(var, states):
+            vector = np.zeros(n, dtype=np.bool_)
+            vector[[states_idxs[(var, state)] for state in states]] = True
+            return vector
+
+        start_states = {
+            var: get_states_vector(var, fa.start_states) for var, fa in boxes.items()
+        }
+        final_states = {
+            var: get_states_vector(var, fa.final_states) for var, fa in boxes.items()
+        }
+        return RFAMatrices(matrices, states_idxs, start_states, final_states)
 
     @staticmethod
     def from_ecfg(ecfg: ECFG) -> "RFA":
@@ -0,0 +1,329 @@
+from abc import ABC, abstractmethod
+from typing import Any, List, Tuple, Union
+import numpy as np
+from scipy.sparse import block_diag, coo_matrix, csr_matrix, kron
+
+from project.bool_matrix import choose_representation
+
+try:
+    import graphblas
+except ImportError:  # pragma: no cover - optional dependency
+    graphblas = None
+
+DEFAULT_BACKEND = "scipy"
+
+
+class Semiring(ABC):
+    """
+    Matrix operations of one semiring implemented by one backend.
+    Engines use only these operations, so semirings and backends can be swapped
+    without changing algorithms.
+    Matrices contain "edge" entries for paths of one step and "unit" entries for empty paths.
+    Absent entries are zeros of the semiring.
+    """
+
+    name: str = ""
+    backend: str = ""
+
+    @abstractmethod
+    def from_bool(self, matrix: csr_matrix) -> Any:
+        """
+        Convert bool csr_matrix to matrix with edge entries at nonzero positions
+        """
+
+    @abstractmethod
+    def selection(self, rows: np.ndarray, cols: np.ndarray, shape: Tuple[int, int]):
+        """
+        Create matrix with unit entries at (rows[k], cols[k]) positions
+        """
+
+    def zeros(self, shape: Tuple[int, int]) -> Any:
+        return self.selection(
+            np.array([], dtype=np.int64), np.array([], dtype=np.int64), shape
+        )
+
+    def identity(self, n: int) -> Any:
+        return self.selection(np.arange(n), np.arange(n), (n, n))
+
+    @abstractmethod
+    def add(self, lhs, rhs) -> Any:
+        pass
+
+    @abstractmethod
+    def matmul(self, lhs, rhs) -> Any:
+        pass
+
+    @abstractmethod
+    def kron(self, lhs, rhs) -> Any:
+        pass
+
+    @abstractmethod
+    def block_diag(self, matrices: List[Any]) -> Any:
+        pass
+
+    @abstractmethod
+    def transpose(self, matrix) -> Any:
+        pass
+
+    @abstractmethod
+    def improved(self, new, old) -> Any:
+        """
+        Get entries of new matrix that are absent in old one or better than in old one
+        """
+
+    @abstractmethod
+    def nnz(self, matrix) -> int:
+        pass
+
+    @abstractmethod
+    def values(self, matrix) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get rows, columns and values of all present entries
+        """
+
+    def nonzero(self, matrix) -> Tuple[np.ndarray, np.ndarray]:
+        rows, cols, _ = self.values(matrix)
+        return rows, cols
+
+
+class ScipyBooleanSemiring(Semiring):
+    """
+    OR-AND semiring over bool csr_matrix, dense enough matrices are kept as BitsetMatrix
+    """
+
+    name = "boolean"
+    backend = "scipy"
+
+    def from_bool(self, matrix: csr_matrix) -> csr_matrix:
+        return csr_matrix(matrix, dtype=np.bool_)
+
+    def selection(self, rows, cols, shape) -> csr_matrix:
+        data = np.ones(len(rows), dtype=np.bool_)
+        return coo_matrix((data, (rows, cols)), shape=shape, dtype=np.bool_).tocsr()
+
+    def add(self, lhs, rhs):
+        return choose_representation(lhs + rhs)
+
+    def matmul(self, lhs, rhs):
+        return lhs @ rhs
+
+    def kron(self, lhs, rhs) -> csr_matrix:
+        return kron(lhs.tocsr(), rhs.tocsr(), format="csr")
+
+    def block_diag(self, matrices) -> csr_matrix:
+        return block_diag([m.tocsr() for m in matrices], format="csr", dtype=np.bool_)
+
+    def transpose(self, matrix) -> csr_matrix:
+        return matrix.tocsr().transpose().tocsr()
+
+    def improved(self, new, old):
+        return new > old
+
+    def nnz(self, matrix) -> int:
+        return matrix.nnz
+
+    def values(self, matrix):
+        rows, cols = matrix.nonzero()
+        return rows, cols, np.ones(len(rows), dtype=np.bool_)
+
+
+def _min_by_position(rows, cols, values, shape) -> csr_matrix:
+    keys = rows.astype(np.int64) * shape[1] + cols
+    order = np.lexsort((values, keys))
+    keys, first = np.unique(keys[order], return_index=True)
+    return coo_matrix(
+        (values[order][first], np.divmod(keys, shape[1])), shape=shape
+    ).tocsr()
+
+
+class ScipyTropicalSemiring(Semiring):
+    """
+    MIN-PLUS semiring over path lengths in float csr_matrix.
+    Edges have length 1 and units have length 0. Every length is stored increased by one,
+    so empty paths are not confused with absent entries.
+    """
+
+    name = "tropical"
+    backend = "scipy"
+
+    def from_bool(self, matrix: csr_matrix) -> csr_matrix:
+        rows, cols = matrix.nonzero()
+        data = np.full(len(rows), 2.0)
+        return coo_matrix((data, (rows, cols)), shape=matrix.shape).tocsr()
+
+    def selection(self, rows, cols, shape) -> csr_matrix:
+        values = np.ones(len(rows))
+        return _min_by_position(np.asarray(rows), np.asarray(cols), values, shape)
+
+    def add(self, lhs, rhs) -> csr_matrix:
+        lhs, rhs = lhs.tocoo(), rhs.tocoo()
+        return _min_by_position(
+            np.concatenate([lhs.row, rhs.row]),
+            np.concatenate([lhs.col, rhs.col]),
+            np.concatenate([lhs.data, rhs.data]),
+            lhs.shape,
+        )
+
+    def matmul(self, lhs, rhs) -> csr_matrix:
+        lhs, rhs = lhs.tocoo(), rhs.tocsr()
+        counts = np.diff(rhs.indptr)[lhs.col]
+        total = counts.sum()
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.repeat(rhs.indptr[lhs.col], counts) + offsets
+        return _min_by_position(
+            np.repeat(lhs.row, counts),
+            rhs.indices[positions],
+            np.repeat(lhs.data, counts) + rhs.data[positions] - 1,
+            (lhs.shape[0], rhs.shape[1]),
+        )
+
+    def kron(self, lhs, rhs) -> csr_matrix:
+        lhs, rhs = lhs.tocoo(), rhs.tocoo()
+        rows = np.add.outer(lhs.row * rhs.shape[0], rhs.row).ravel()
+        cols = np.add.outer(lhs.col * rhs.shape[1], rhs.col).ravel()
+        values = np.add.outer(lhs.data, rhs.data).ravel() - 1
+        shape = (lhs.shape[0] * rhs.shape[0], lhs.shape[1] * rhs.shape[1])
+        return _min_by_position(rows, cols, values, shape)
+
+    def block_diag(self, matrices) -> csr_matrix:
+        return block_diag(matrices, format="csr")
+
+    def transpose(self, matrix) -> csr_matrix:
+        return matrix.transpose().tocsr()
+
+    def improved(self, new, old) -> csr_matrix:
+        new = new.tocoo()
+        old_values = np.asarray(old.tocsr()[new.row, new.col]).ravel()
+        mask = (old_values == 0) | (new.data < old_values)
+        return coo_matrix(
+            (new.data[mask], (new.row[mask], new.col[mask])), shape=new.shape
+        ).tocsr()
+
+    def nnz(self, matrix) -> int:
+        return matrix.nnz
+
+    def values(self, matrix):
+        matrix = matrix.tocoo()
+        return matrix.row, matrix.col, matrix.data.astype(np.int64) - 1
+
+
+class GraphBLASSemiring(Semiring):
+    """
+    Semiring over python-graphblas matrices, available only if python-graphblas is installed.
+    """
+
+    backend = "graphblas"
+
+    def __init__(self, name: str):
+        self.name = name
+        if name == "boolean":
+            self._dtype = bool
+            self._edge, self._unit = True, True
+            self._add = graphblas.binary.lor
+            self._mul = graphblas.binary.land
+            self._semiring = graphblas.semiring.lor_land
+        else:
+            self._dtype = np.int64
+            self._edge, self._unit = 1, 0
+            self._add = graphblas.binary.min
+            self._mul = graphblas.binary.plus
+            self._semiring = graphblas.semiring.min_plus
+
+    def _from_coo(self, rows, cols, values, shape):
+        values = np.broadcast_to(np.asarray(values, dtype=self._dtype), len(rows))
+        return graphblas.Matrix.from_coo(
+            np.asarray(rows, dtype=np.uint64),
+            np.asarray(cols, dtype=np.uint64),
+            values,
+            dtype=self._dtype,
+            nrows=shape[0],
+            ncols=shape[1],
+            dup_op=self._add,
+        )
+
+    def from_bool(self, matrix: csr_matrix):
+        rows, cols = matrix.nonzero()
+        return self._from_coo(rows, cols, self._edge, matrix.shape)
+
+    def selection(self, rows, cols, shape):
+        return self._from_coo(rows, cols, self._unit, shape)
+
+    def add(self, lhs, rhs):
+        return lhs.ewise_add(rhs, self._add).new()
+
+    def matmul(self, lhs, rhs):
+        return lhs.mxm(rhs, self._semiring).new()
+
+    def kron(self, lhs, rhs):
+        return lhs.kronecker(rhs, self._mul).new()
+
+    def block_diag(self, matrices):
+        rows, cols, values = [], [], []
+        row_offset = col_offset = 0
+        for matrix in matrices:
+            m_rows, m_cols, m_values = matrix.to_coo()
+            rows.append(m_rows.astype(np.int64) + row_offset)
+            cols.append(m_cols.astype(np.int64) + col_offset)
+            values.append(m_values)
+            row_offset += matrix.nrows
+            col_offset += matrix.ncols
+        return self._from_coo(
+            np.concatenate(rows),
+            np.concatenate(cols),
+            np.concatenate(values),
+            (row_offset, col_offset),
+        )
+
+    def transpose(self, matrix):
+        return matrix.T.new()
+
+    def improved(self, new, old):
+        res = graphblas.Matrix(self._dtype, new.nrows, new.ncols)
+        res(~old.S) << new
+        if self.name != "boolean":
+            better = new.ewise_mult(old, graphblas.binary.lt).new()
+            res(better.V) << new
+        return res
+
+    def nnz(self, matrix) -> int:
+        return matrix.nvals
+
+    def values(self, matrix):
+        rows, cols, values = matrix.to_coo()
+        return rows.astype(np.int64), cols.astype(np.int64), values
+
+
+_SCIPY_SEMIRINGS = {
+    "boolean": ScipyBooleanSemiring(),
+    "tropical": ScipyTropicalSemiring(),
+}
+
+
+def available_backends() -> List[str]:
+    """
+    Get names of backends that can be used in this environment
+    """
+    if graphblas is None:
+        return ["scipy"]
+    return ["scipy", "graphblas"]
+
+
+def get_semiring(name: str = "boolean", backend: Union[str, None] = None) -> Semiring:
+    """
+    Get semiring by name ("boolean" or "tropical") implemented by backend ("scipy" or "graphblas").
+    By default, DEFAULT_BACKEND is used.
+    """
+    if backend is None:
+        backend = DEFAULT_BACKEND
+    if name not in _SCIPY_SEMIRINGS:
+        raise ValueError(
+            f"Unknown semiring '{name}', expected one of: {', '.join(_SCIPY_SEMIRINGS)}"
+        )
+    if backend not in available_backends():
+        raise ValueError(
+            f"Unknown or unavailable backend '{backend}', "
+            f"expected one of: {', '.join(available_backends())}"
+        )
+    if backend == "graphblas":
+        return GraphBLASSemiring(name)
+    return _SCIPY_SEMIRINGS[name]
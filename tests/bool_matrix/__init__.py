@@ -0,0 +1 @@
+print("import sources directory")
@@ -0,0 +1,95 @@
+import numpy as np
+import networkx as nx
+import pytest
+from pyformlang.cfg import CFG
+from scipy.sparse import csr_matrix
+
+import project.bool_matrix as bool_matrix
+import project.cfpq as cfpq
+from project.bool_matrix import BitsetMatrix, choose_representation
+from project.finite_automata_utils import find_reachable_in_graph_from_any
+from project.labeled_graph import LabeledGraph
+
+
+def random_matrix(rng, shape):
+    return csr_matrix(rng.random(shape) < 0.3)
+
+
+def as_list(matrix):
+    return matrix.toarray().tolist()
+
+
+@pytest.mark.parametrize("n, m, k", [(1, 1, 1), (5, 7, 9), (64, 64, 64), (70, 130, 65)])
+def test_same_as_csr(n, m, k):
+    rng = np.random.default_rng(n)
+    a, b, c = (
+        random_matrix(rng, (n, m)),
+        random_matrix(rng, (m, k)),
+        random_matrix(rng, (n, m)),
+    )
+    bits_a, bits_b = BitsetMatrix.from_csr(a), BitsetMatrix.from_csr(b)
+
+    assert as_list(bits_a @ bits_b) == as_list(a @ b)
+    assert as_list(a @ bits_b) == as_list(a @ b)
+    assert as_list(bits_a @ b) == as_list(a @ b)
+    assert as_list(bits_a + c) == as_list(a + c)
+    assert as_list(c + bits_a) == as_list(a + c)
+    assert as_list(bits_a > c) == as_list(a > c)
+    assert as_list(c > bits_a) == as_list(c > a)
+    assert bits_a.nnz == a.nnz
+    assert (bits_a.tocsr() != a).nnz == 0
+
+
+def test_choose_representation():
+    dense = csr_matrix(np.eye(4, dtype=np.bool_))
+    sparse = csr_matrix(np.eye(100, dtype=np.bool_))
+    assert isinstance(choose_representation(dense, 0.1), BitsetMatrix)
+    assert isinstance(choose_representation(sparse, 0.1), csr_matrix)
+    assert isinstance(
+        choose_representation(BitsetMatrix.from_csr(sparse), 0.1), csr_matrix
+    )
+
+
+def test_cfpq_with_both_representations(monkeypatch):
+    gr = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "a"}),
+            (2, 0, {"label": "a"}),
+            (0, 3, {"label": "b"}),
+            (3, 0, {"label": "b"}),
+        ]
+    )
+    cfg = CFG.from_text("S -> a S b | a b | S S")
+
+    monkeypatch.setattr(bool_matrix, "DENSITY_THRESHOLD", 2.0)
+    sparse_result = cfpq.matrix(gr, cfg), cfpq.tensor(gr, cfg)
+    monkeypatch.setattr(bool_matrix, "DENSITY_THRESHOLD", 0.0)
+    bitset_result = cfpq.matrix(gr, cfg), cfpq.tensor(gr, cfg)
+    assert sparse_result == bitset_result
+
+
+def test_sparse_operands_are_not_packed(monkeypatch):
+    n, m = 20000, 60000
+    rng = np.random.default_rng(0)
+    graph = LabeledGraph.from_indexed_edges(
+        list(range(n)),
+        ["a"],
+        rng.integers(0, n, m),
+        rng.integers(0, n, m),
+        np.zeros(m, dtype=np.int64),
+    )
+    monkeypatch.setattr(bool_matrix, "DENSITY_THRESHOLD", 2.0)
+    expected = find_reachable_in_graph_from_any(graph, "a*", [0], range(n))
+
+    shapes = []
+    zeros = BitsetMatrix.zeros
+    monkeypatch.setattr(
+        BitsetMatrix,
+        "zeros",
+        staticmethod(lambda shape: shapes.append(shape) or zeros(shape)),
+    )
+    monkeypatch.setattr(bool_matrix, "DENSITY_THRESHOLD", 0.03)
+    assert find_reachable_in_graph_from_any(graph, "a*", [0], range(n)) == expected
+    assert len(shapes) > 0
+    assert all(min(shape) < n for shape in shapes)
@@ -1,7 +1,8 @@
+import pytest
 import networkx as nx
 from pyformlang.cfg import CFG, Variable
 
-from project.cfpq import helling
+from project.cfpq import helling, matrix
 
 
 def test_simple():
@@ -78,3 +79,77 @@ def test_with_start_final_and_var():
     expected = {(0, Variable("S"), 3)}
     res = helling(gr, cfg, {0}, {3}, Variable("S"))
     assert expected == res
+
+
+def test_engines_give_same_result():
+    gr = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "a"}),
+            (2, 3, {"label": "b"}),
+            (3, 4, {"label": "b"}),
+            (4, 5, {"label": "a"}),
+            (5, 6, {"label": "b"}),
+            (1, 6, {"label": "b"}),
+        ]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> a S b | a b
+    S -> S S"""
+    )
+
+    naive = helling(gr, cfg, engine="naive")
+    indexed = helling(gr, cfg, engine="indexed")
+    assert naive == indexed
+    assert (0, Variable("S"), 6) in indexed
+
+
+def test_unknown_engine():
+    gr = nx.MultiDiGraph([(0, 1, {"label": "a"})])
+    cfg = CFG.from_text("S -> a")
+
+    with pytest.raises(ValueError):
+        helling(gr, cfg, engine="unknown")
+
+
+def test_cycles():
+    gr = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "a"}),
+            (2, 0, {"label": "a"}),
+            (0, 3, {"label": "b"}),
+            (3, 0, {"label": "b"}),
+        ]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> a S b | a b"""
+    )
+
+    res = helling(gr, cfg, variable=Variable("S"))
+    assert res == matrix(gr, cfg, variable=Variable("S"))
+    assert (0, Variable("S"), 0) in res
+    assert (2, Variable("S"), 3) in res
+
+
+def test_naive_engine_on_cycles():
+    gr = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 0, {"label": "a"}),
+            (0, 0, {"label": "b"}),
+        ]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> A A b
+    A -> a S | $
+    S -> $"""
+    )
+
+    assert helling(gr, cfg, engine="naive") == helling(gr, cfg, engine="indexed")
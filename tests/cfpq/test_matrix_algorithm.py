@@ -1,3 +1,4 @@
+import pytest
 import networkx as nx
 from pyformlang.cfg import CFG, Variable
 
@@ -78,3 +79,57 @@ def test_with_start_final_and_var():
     expected = {(0, Variable("S"), 3)}
     res = cfpq.matrix(gr, cfg, {0}, {3}, Variable("S"))
     assert expected == res
+
+
+def test_engines_give_same_result():
+    gr = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "a"}),
+            (2, 0, {"label": "a"}),
+            (0, 3, {"label": "b"}),
+            (3, 0, {"label": "b"}),
+        ]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> a S b | a b | S S
+    S -> $"""
+    )
+
+    naive = cfpq.matrix(gr, cfg, engine="naive")
+    semi_naive = cfpq.matrix(gr, cfg, engine="semi_naive")
+    assert naive == semi_naive
+    assert semi_naive == cfpq.helling(gr, cfg)
+    assert (1, Variable("S"), 0) in semi_naive
+
+
+@pytest.mark.parametrize("engine", ["naive", "semi_naive"])
+def test_workers_give_same_result(engine):
+    gr = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "a"}),
+            (2, 0, {"label": "a"}),
+            (0, 3, {"label": "b"}),
+            (3, 0, {"label": "b"}),
+        ]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> a S b | a b | S S
+    S -> $"""
+    )
+
+    sequential = cfpq.matrix(gr, cfg, engine=engine)
+    parallel = cfpq.matrix(gr, cfg, engine=engine, workers=4)
+    assert sequential == parallel
+
+
+def test_non_positive_workers():
+    gr = nx.MultiDiGraph([(0, 1, {"label": "a"})])
+    cfg = CFG.from_text("S -> a")
+    with pytest.raises(ValueError):
+        cfpq.matrix(gr, cfg, workers=0)
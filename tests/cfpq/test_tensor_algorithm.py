@@ -0,0 +1,152 @@
+import networkx as nx
+from pyformlang.cfg import CFG, Variable
+
+import project.cfpq as cfpq
+from project.rfa import RFA
+
+
+def test_simple():
+    gr = nx.MultiDiGraph(
+        [(0, 1, {"label": "a"}), (1, 2, {"label": "b"}), (2, 3, {"label": "c"})]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> A S1
+    S1 -> B C
+    A -> a
+    B -> b
+    C -> c"""
+    )
+
+    expected = {
+        (0, Variable("A"), 1),
+        (1, Variable("B"), 2),
+        (2, Variable("C"), 3),
+        (1, Variable("S1"), 3),
+        (0, Variable("S"), 3),
+    }
+    res = cfpq.tensor(gr, cfg)
+    assert expected == res
+
+
+def test_extra_graph():
+    gr = nx.MultiDiGraph(
+        [(0, 1, {"label": "a"}), (1, 2, {"label": "b"}), (2, 3, {"label": "c"})]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> B C
+    B -> b
+    C -> c"""
+    )
+
+    expected = {(1, Variable("B"), 2), (2, Variable("C"), 3), (1, Variable("S"), 3)}
+    res = cfpq.tensor(gr, cfg)
+    assert expected == res
+
+
+def test_extra_query():
+    gr = nx.MultiDiGraph([(0, 1, {"label": "a"}), (1, 2, {"label": "b"})])
+
+    cfg = CFG.from_text(
+        """
+    S -> B C
+    B -> b
+    C -> c"""
+    )
+
+    expected = {(1, Variable("B"), 2)}
+    res = cfpq.tensor(gr, cfg)
+    assert expected == res
+
+
+def test_with_start_final_and_var():
+    gr = nx.MultiDiGraph(
+        [(0, 1, {"label": "a"}), (1, 2, {"label": "b"}), (2, 3, {"label": "c"})]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> A S1
+    S1 -> B C
+    A -> a
+    B -> b
+    C -> c"""
+    )
+
+    expected = {(0, Variable("S"), 3)}
+    res = cfpq.tensor(gr, cfg, {0}, {3}, Variable("S"))
+    assert expected == res
+
+
+def test_same_as_matrix():
+    gr = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "a"}),
+            (2, 0, {"label": "a"}),
+            (0, 3, {"label": "b"}),
+            (3, 0, {"label": "b"}),
+        ]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> a S b | a b | S S
+    S -> $"""
+    )
+
+    res = cfpq.tensor(gr, cfg)
+    assert res == cfpq.matrix(gr, cfg, variable=Variable("S"))
+    assert (1, Variable("S"), 0) in res
+
+
+def test_long_bodies():
+    gr = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "b"}),
+            (2, 3, {"label": "c"}),
+            (3, 0, {"label": "d"}),
+            (3, 4, {"label": "d"}),
+        ]
+    )
+
+    cfg = CFG.from_text(
+        """
+    S -> a b c d | a b c d S"""
+    )
+
+    expected = {(0, Variable("S"), 0), (0, Variable("S"), 4)}
+    res = cfpq.tensor(gr, cfg, variable=Variable("S"))
+    assert expected == res
+    assert res == cfpq.matrix(gr, cfg, variable=Variable("S"))
+
+
+def test_with_rfa():
+    gr = nx.MultiDiGraph(
+        [(0, 1, {"label": "a"}), (1, 2, {"label": "b"}), (2, 3, {"label": "c"})]
+    )
+
+    rfa = RFA.from_text(
+        """
+    S -> A B c
+    A -> a
+    B -> b"""
+    )
+
+    expected = {(0, Variable("S"), 3)}
+    assert expected == cfpq.tensor(gr, rfa, variable=Variable("S"))
+    assert expected == cfpq.tensor(gr, rfa, variable=Variable("S"))
+
+
+def test_label_equal_to_variable_name():
+    gr = nx.MultiDiGraph([(0, 1, {"label": "S"}), (1, 2, {"label": "a"})])
+    cfg = CFG.from_text("S -> a")
+
+    expected = {(1, Variable("S"), 2)}
+    assert cfpq.tensor(gr, cfg) == expected
+    assert cfpq.matrix(gr, cfg) == expected
+    assert cfpq.helling(gr, cfg) == expected
@@ -0,0 +1,93 @@
+from pyformlang.cfg import CFG, Production, Terminal, Variable
+import pytest
+import project.context_free_grammar as cfg_utils
+
+
+def test_equal_grammars_are_normalized_once():
+    cfg_utils.clear_wcnf_cache()
+    wcnf = cfg_utils.get_wcnf(CFG.from_text("S -> a S b | $"))
+    assert cfg_utils.get_wcnf(CFG.from_text("S -> $ | a S b")) is wcnf
+    info = cfg_utils.wcnf_cache_info()
+    assert info.misses == 1
+    assert info.hits == 1
+
+
+def test_set_wcnf_cache_size():
+    default = cfg_utils.WCNF_CACHE_SIZE
+    try:
+        cfg_utils.set_wcnf_cache_size(1)
+        assert cfg_utils.wcnf_cache_info().maxsize == 1
+        wcnf = cfg_utils.get_wcnf(CFG.from_text("S -> a"))
+        cfg_utils.get_wcnf(CFG.from_text("S -> b"))
+        assert cfg_utils.get_wcnf(CFG.from_text("S -> a")) is not wcnf
+        assert cfg_utils.wcnf_cache_info().currsize == 1
+    finally:
+        cfg_utils.set_wcnf_cache_size(default)
+    assert cfg_utils.wcnf_cache_info().maxsize == default
+
+
+def test_productions_are_grouped_by_body_shape():
+    wcnf = cfg_utils.get_wcnf(CFG.from_text("S -> a S b | $"))
+    variables = {v: i for i, v in enumerate(wcnf.variables)}
+    terminals = {t: i for i, t in enumerate(wcnf.terminals)}
+    s, a, b = Variable("S"), Variable("a#CNF#"), Variable("b#CNF#")
+    c = Variable("C#CNF#1")
+    assert wcnf.start_symbol == s
+    assert set(wcnf.variables) == {s, a, b, c}
+    assert set(wcnf.terminals) == {Terminal("a"), Terminal("b")}
+    assert wcnf.epsilon_heads == (variables[s],)
+    assert set(wcnf.terminal_prods) == {
+        (variables[a], terminals[Terminal("a")]),
+        (variables[b], terminals[Terminal("b")]),
+    }
+    assert set(wcnf.binary_prods) == {
+        (variables[s], variables[a], variables[c]),
+        (variables[c], variables[s], variables[b]),
+    }
+
+
+def test_terminals_and_variables_with_same_name_differ():
+    s, x = Variable("S"), "x"
+    lhs = CFG(start_symbol=s, productions={Production(s, [Terminal(x)])})
+    rhs = CFG(
+        start_symbol=s,
+        productions={
+            Production(s, [Variable(x)]),
+            Production(Variable(x), [Terminal("y")]),
+        },
+    )
+    assert cfg_utils.get_wcnf(lhs).terminals == (Terminal("x"),)
+    assert cfg_utils.get_wcnf(rhs).terminals == (Terminal("y"),)
+
+
+def test_compiled_grammar_lookup_tables():
+    grammar = cfg_utils.compile_grammar(CFG.from_text("S -> A B | $\nA -> a\nB -> b"))
+    variables = {v: i for i, v in enumerate(grammar.variables)}
+    s, a, b = (
+        variables[Variable("S")],
+        variables[Variable("A")],
+        variables[Variable("B")],
+    )
+    assert grammar.heads_by_label("a") == (a,)
+    assert grammar.heads_by_label("c") == ()
+    assert grammar.nullable_heads == (s,)
+    assert grammar.binary_prods == ((s, a, b),)
+    assert grammar.binary_heads == {(a, b): (s,)}
+    assert grammar.uses[a] == grammar.uses[b] == (0,)
+    assert grammar.uses[s] == ()
+
+
+def test_normal_form_is_immutable():
+    wcnf = cfg_utils.get_wcnf(CFG.from_text("S -> a S b | $"))
+    for field in wcnf[1:]:
+        assert isinstance(field, tuple)
+
+
+def test_compiled_grammar_is_immutable():
+    grammar = cfg_utils.compile_grammar(CFG.from_text("S -> A B | $\nA -> a\nB -> b"))
+    with pytest.raises(TypeError):
+        grammar.binary_heads[(0, 0)] = (0,)
+    with pytest.raises(TypeError):
+        grammar.terminals_idxs["c"] = 0
+    with pytest.raises(AttributeError):
+        grammar.uses[0].append(0)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from pyformlang.regular_expression import Regex
+
+from project.dfa_table import (
+    determinize,
+    dfa_table_to_dfa,
+    fa_to_dfa_table,
+    fa_to_int_nfa,
+    minimize_dfa_table,
+)
+
+
+@pytest.mark.parametrize("regex", ["a*", "a b | a c", "(a | b)* c", "a* a*", "$"])
+def test_fa_to_dfa_table_is_minimal(regex):
+    nfa = Regex(regex).to_epsilon_nfa()
+    dfa = dfa_table_to_dfa(fa_to_dfa_table(nfa))
+    expected = nfa.minimize()
+    assert dfa.is_equivalent_to(expected)
+    assert len(dfa.states) == len(expected.states)
+
+
+def test_determinize_merges_epsilon_closures():
+    # 0 -eps-> 1 -a-> 2, 0 -a-> 2
+    dfa = determinize(3, ["a"], [(1, 0, 2), (0, 0, 2)], [(0, 1)], [0], [2])
+    assert dfa.delta.tolist() == [[1], [-1]]
+    assert dfa.is_final.tolist() == [False, True]
+
+
+def test_minimize_removes_dead_states():
+    nfa = fa_to_int_nfa(Regex("a b").to_epsilon_nfa())
+    dfa = determinize(*nfa)
+    dead = np.full((1, len(dfa.symbols)), len(dfa.delta), dtype=np.int64)
+    delta = np.vstack([dfa.delta, dead])
+    delta[0, delta[0] < 0] = len(dfa.delta)
+    table = minimize_dfa_table(
+        dfa._replace(delta=delta, is_final=np.append(dfa.is_final, False))
+    )
+    assert len(table.delta) == 3
+    assert np.count_nonzero(table.delta >= 0) == 2
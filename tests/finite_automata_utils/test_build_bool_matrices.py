@@ -0,0 +1,15 @@
+import project.finite_automata_utils as fa_utils
+
+
+def test_matrices_for_every_label():
+    edges = [(0, "a", 1), (1, "b", 2), (2, "a", 0), (0, "a", 1)]
+    matrices = fa_utils.build_bool_matrices(edges, 3)
+    assert matrices.keys() == {"a", "b"}
+    assert {(0, 1), (2, 0)} == set(zip(*matrices["a"].nonzero()))
+    assert {(1, 2)} == set(zip(*matrices["b"].nonzero()))
+    assert matrices["a"].shape == (3, 3)
+    assert matrices["a"].nnz == 2
+
+
+def test_no_edges():
+    assert fa_utils.build_bool_matrices([], 3) == {}
@@ -0,0 +1,70 @@
+import networkx as nx
+from pyformlang.finite_automaton import Symbol
+
+import project.finite_automata_utils as fa_utils
+
+
+def to_edges(decomposition):
+    return {
+        (decomposition.nodes[i], symb, decomposition.nodes[j])
+        for symb, matrix in decomposition.matrices.items()
+        for i, j in zip(*matrix.nonzero())
+    }
+
+
+def test_same_as_through_fa():
+    graph = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "b"}),
+            (2, 0, {"label": "a"}),
+            (2, 0, {"label": "b"}),
+            (1, 1, {"label": "c"}),
+        ]
+    )
+    fa_matrices, states_idxs = fa_utils.get_bool_matrices_for_fa(
+        fa_utils.convert_nx_graph_to_nfa(graph)
+    )
+    states = {i: s.value for s, i in states_idxs.items()}
+    expected = {
+        (states[i], symb, states[j])
+        for symb, matrix in fa_matrices.items()
+        for i, j in zip(*matrix.nonzero())
+    }
+    assert to_edges(fa_utils.get_graph_decomposition(graph)) == expected
+
+
+def test_from_edge_list_with_isolated_nodes():
+    decomposition = fa_utils.build_graph_decomposition(
+        [("x", "a", "y"), ("y", "b", "z")], nodes=["w", "x"]
+    )
+    assert decomposition.nodes == ["w", "x", "y", "z"]
+    assert decomposition.nodes_idxs["z"] == 3
+    assert to_edges(decomposition) == {
+        ("x", Symbol("a"), "y"),
+        ("y", Symbol("b"), "z"),
+    }
+
+
+def test_epsilon_edges_are_folded():
+    decomposition = fa_utils.build_graph_decomposition(
+        [(0, "a", 1), (1, "epsilon", 2), (2, "b", 3)]
+    )
+    assert to_edges(decomposition) == {
+        (0, Symbol("a"), 1),
+        (0, Symbol("a"), 2),
+        (1, Symbol("b"), 3),
+        (2, Symbol("b"), 3),
+    }
+    assert fa_utils.find_reachable_in_graph_from_any(
+        nx.MultiDiGraph(
+            [
+                (0, 1, {"label": "a"}),
+                (1, 2, {"label": "epsilon"}),
+                (2, 3, {"label": "b"}),
+            ]
+        ),
+        "ab",
+        [0],
+        [3],
+    ) == {3}
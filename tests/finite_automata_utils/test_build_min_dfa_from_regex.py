@@ -1,3 +1,6 @@
+import pytest
+from pyformlang.regular_expression import PythonRegex
+
 import project.graph_utils as graph_utils  # on import will print something from __init__ file
 import project.finite_automata_utils as fa_utils  # on import will print something from __init__ file
 
@@ -38,3 +41,29 @@ def test_repeating_regex():
     assert dfa.accepts("abbbcaccaacb")
     assert not dfa.accepts("")
     assert not dfa.accepts("abcd")
+
+
+@pytest.mark.parametrize(
+    "regex",
+    [
+        r"[pl]oopa",
+        r"([a-z1-9]+|[1-9]*)(abc|abd)",
+        r"(ab)*a(ca)*",
+        r"(ab?)+",
+        r"a b",
+        r"[a-c]?b+|c*",
+    ],
+)
+def test_same_as_pyformlang(regex):
+    expected = PythonRegex(regex).to_epsilon_nfa().minimize()
+    actual = fa_utils.build_min_dfa_from_regex(regex)
+    assert actual.is_equivalent_to(expected)
+    assert len(actual.states) == len(expected.states)
+
+
+@pytest.mark.parametrize("regex", [r"a.c", r"a|", r"[^a]b"])
+def test_unsupported_syntax_falls_back_to_pyformlang(regex):
+    with pytest.raises(fa_utils._UnsupportedRegex):
+        fa_utils._compile_regex_table(regex)
+    expected = PythonRegex(regex).to_epsilon_nfa().minimize()
+    assert fa_utils.build_min_dfa_from_regex(regex).is_equivalent_to(expected)
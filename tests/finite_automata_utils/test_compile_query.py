@@ -0,0 +1,46 @@
+import networkx as nx
+
+import project.finite_automata_utils as fa_utils
+
+
+def test_repeated_query_hits_cache():
+    fa_utils.clear_query_cache()
+    graph = nx.MultiDiGraph([(0, 1, {"label": "a"}), (1, 2, {"label": "b"})])
+    for _ in range(3):
+        assert fa_utils.find_reachable_in_graph_from_each(graph, "ab*", [0], [2]) == {
+            0: {2}
+        }
+    info = fa_utils.query_cache_info()
+    assert info.misses == 1
+    assert info.hits == 2
+
+
+def test_compiled_query():
+    fa_utils.clear_query_cache()
+    compiled = fa_utils.compile_query("a(b|c)")
+    assert fa_utils.compile_query("a(b|c)") is compiled
+    assert compiled.to_dfa().is_equivalent_to(
+        fa_utils.build_min_dfa_from_regex("a(b|c)")
+    )
+    assert compiled.states_cnt == 3
+    assert len(compiled.start_idxs) == 1
+    assert len(compiled.final_idxs) == 1
+    assert sum(m.nnz for m in compiled.matrices.values()) == 3
+
+
+def test_whitespace_is_significant():
+    assert fa_utils.compile_query("a b") is not fa_utils.compile_query("ab")
+
+
+def test_set_query_cache_size():
+    default = fa_utils.QUERY_CACHE_SIZE
+    try:
+        fa_utils.set_query_cache_size(1)
+        assert fa_utils.query_cache_info().maxsize == 1
+        compiled = fa_utils.compile_query("a")
+        fa_utils.compile_query("b")
+        assert fa_utils.compile_query("a") is not compiled
+        assert fa_utils.query_cache_info().currsize == 1
+    finally:
+        fa_utils.set_query_cache_size(default)
+    assert fa_utils.query_cache_info().maxsize == default
@@ -4,7 +4,10 @@ import pytest
 # on import will print something from __init__ file
 import os
 
-from project.finite_automata_utils import find_reachable_in_fa_from_each
+from project.finite_automata_utils import (
+    find_reachable_in_fa_from_any,
+    find_reachable_in_fa_from_each,
+)
 
 
 def setup_module(module):
@@ -33,3 +36,26 @@ def test_multiple_starts_one_final():
     actual = find_reachable_in_fa_from_each(fa, query, [1, 4])
     excepted = {1: {3}, 4: {3}}
     assert actual == excepted
+
+
+def test_same_as_from_any():
+    fa = EpsilonNFA()
+    fa.add_transitions(
+        [(1, "a", 2), (2, "b", 3), (3, "a", 1), (3, "b", 4), (4, "a", 2), (2, "a", 5)]
+    )
+
+    query = "(ab)*a"
+    starts = [1, 2, 3, 4, 5]
+    actual = find_reachable_in_fa_from_each(fa, query, starts)
+    excepted = {
+        start: find_reachable_in_fa_from_any(fa, query, [start]) for start in starts
+    }
+    assert actual == excepted
+    assert actual[1] == {1, 2}
+
+
+def test_no_starts():
+    fa = EpsilonNFA()
+    fa.add_transitions([(1, "a", 2)])
+
+    assert find_reachable_in_fa_from_each(fa, "a", []) == {}
@@ -0,0 +1,43 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+import project.finite_automata_utils as fa_utils
+
+
+def to_set(matrix):
+    return set(zip(*matrix.nonzero()))
+
+
+def chain_with_loop():
+    edges = [(0, 1), (1, 2), (2, 3), (3, 1)]
+    rows, cols = map(np.array, zip(*edges))
+    return fa_utils.build_bool_matrix(rows, cols, 5)
+
+
+def test_closure():
+    closure = fa_utils.get_transitive_closure(chain_with_loop())
+    expected = {(0, j) for j in [1, 2, 3]} | {
+        (i, j) for i in [1, 2, 3] for j in [1, 2, 3]
+    }
+    assert to_set(closure) == expected
+
+
+def test_extend_closure():
+    matrix = chain_with_loop()
+    closure = fa_utils.get_transitive_closure(matrix)
+    matrix[3, 4] = True
+    extended = fa_utils.get_transitive_closure(matrix, closure)
+    assert to_set(extended) == to_set(fa_utils.get_transitive_closure(matrix))
+    assert (0, 4) in to_set(extended)
+
+
+def test_start_rows():
+    matrix = chain_with_loop()
+    closure = fa_utils.get_transitive_closure(matrix, start_rows=[0, 2])
+    full = fa_utils.get_transitive_closure(matrix)
+    assert closure.shape == (5, 5)
+    assert to_set(closure) == {(i, j) for i, j in to_set(full) if i in [0, 2]}
+
+
+def test_empty():
+    matrix = csr_matrix((3, 3), dtype=np.bool_)
+    assert fa_utils.get_transitive_closure(matrix).nnz == 0
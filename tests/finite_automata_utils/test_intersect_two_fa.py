@@ -30,3 +30,13 @@ def test_intersect_with_loops():
         assert res.accepts(accept)
     for not_accept in not_accepts:
         assert not res.accepts(not_accept)
+
+
+def test_only_reachable_states():
+    lhs = fa_utils.build_min_dfa_from_regex("ab*")
+    rhs = fa_utils.build_min_dfa_from_regex("[ac]b")
+    res = fa_utils.intersect_two_fa(lhs, rhs)
+    assert res.accepts("ab")
+    assert not res.accepts("a")
+    assert not res.accepts("abb")
+    assert len(res.states) == 3
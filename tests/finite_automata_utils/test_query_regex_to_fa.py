@@ -67,3 +67,16 @@ def test_query_with_loops():
     assert len(pairs) == 2
     assert (0, 1) in pairs
     assert (0, 2) in pairs
+
+
+def test_all_pairs_closure():
+    fa = EpsilonNFA()
+    fa.add_transitions([(0, "a", 1), (1, "b", 0), (1, "c", 2), (2, "a", 1)])
+    fa.add_start_state(0)
+    fa.add_start_state(2)
+    fa.add_final_state(1)
+    fa.add_final_state(2)
+    query = "(ab)*a(ca)*"
+    pairs = fa_utils.query_regex_to_fa(fa, query)
+    assert pairs == fa_utils.query_regex_to_fa(fa, query, from_start_states_only=False)
+    assert pairs == {(0, 1), (2, 1)}
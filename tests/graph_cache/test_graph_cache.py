@@ -0,0 +1,123 @@
+import os
+import networkx as nx
+import numpy as np
+
+import project.finite_automata_utils as fa_utils
+import project.graph_cache as graph_cache
+
+
+def make_graph(edges):
+    return nx.MultiDiGraph([(u, v, {"label": label}) for u, label, v in edges])
+
+
+def test_fingerprint_does_not_depend_on_order():
+    edges = [(0, "a", 1), (1, "b", 2), (2, "a", 0)]
+    assert graph_cache.graph_fingerprint(
+        make_graph(edges)
+    ) == graph_cache.graph_fingerprint(make_graph(edges[::-1]))
+    assert graph_cache.graph_fingerprint(
+        make_graph(edges)
+    ) != graph_cache.graph_fingerprint(make_graph(edges[:2]))
+
+
+def test_save_and_load(tmp_path):
+    graph = make_graph([(0, "a", 1), (1, "b", 2), (2, "a", 0), (0, "a", 2)])
+    decomposition = fa_utils.get_graph_decomposition(graph)
+    path = str(tmp_path / "entry")
+    graph_cache.save_decomposition(path, decomposition)
+    loaded = graph_cache.load_decomposition(path)
+
+    assert loaded.nodes == decomposition.nodes
+    assert loaded.nodes_idxs == decomposition.nodes_idxs
+    assert loaded.matrices.keys() == decomposition.matrices.keys()
+    for label, matrix in decomposition.matrices.items():
+        assert (loaded.matrices[label] != matrix).nnz == 0
+        # read-only memory map is used without copying
+        assert not loaded.matrices[label].indices.flags.writeable
+
+
+def test_query_functions_use_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(graph_cache, "CACHE_DIR", str(tmp_path))
+    graph = make_graph([(0, "a", 1), (1, "b", 2), (2, "a", 0)])
+    expected = {0: {2}, 1: set()}
+
+    assert fa_utils.find_reachable_in_graph_from_each(graph, "ab", [0, 1], [2]) == (
+        expected
+    )
+    assert os.listdir(tmp_path) == [
+        graph_cache.entry_name(graph_cache.graph_fingerprint(graph))
+    ]
+    assert fa_utils.find_reachable_in_graph_from_each(graph, "ab", [0, 1], [2]) == (
+        expected
+    )
+    assert fa_utils.query_regex_to_fa_with_states(graph, "ab", {0, 1}, {2}) == {(0, 2)}
+
+
+def test_precomputed_key(tmp_path, monkeypatch):
+    graph = make_graph([(0, "a", 1), (1, "b", 2)])
+    fa_utils.get_graph_decomposition(graph, str(tmp_path), key="my-graph")
+
+    def fail(_):
+        raise AssertionError("fingerprint is computed")
+
+    monkeypatch.setattr(graph_cache, "graph_fingerprint", fail)
+    loaded = fa_utils.get_graph_decomposition(graph, str(tmp_path), key="my-graph")
+    assert loaded.nodes == [0, 1, 2]
+    assert os.listdir(tmp_path) == [graph_cache.entry_name("my-graph")]
+
+
+def test_format_version_is_part_of_entry_name(tmp_path, monkeypatch):
+    graph = make_graph([(0, "a", 1)])
+    fa_utils.get_graph_decomposition(graph, str(tmp_path), key="g")
+    version = graph_cache.CACHE_FORMAT_VERSION
+    monkeypatch.setattr(graph_cache, "CACHE_FORMAT_VERSION", version + 1)
+    fa_utils.get_graph_decomposition(graph, str(tmp_path), key="g")
+    assert sorted(os.listdir(tmp_path)) == [f"v{version}-g", f"v{version + 1}-g"]
+
+
+def test_graph_file_is_keyed_without_reading(tmp_path, monkeypatch):
+    dot_path = tmp_path / "graph.dot"
+    dot_path.write_text("digraph {\n0 -> 1 [label=a];\n}\n")
+    cache_dir = str(tmp_path / "cache")
+    expected = fa_utils.get_graph_decomposition(str(dot_path), cache_dir)
+
+    def fail(_):
+        raise AssertionError("graph file is read")
+
+    monkeypatch.setattr(fa_utils, "read_graph", fail)
+    loaded = fa_utils.get_graph_decomposition(str(dot_path), cache_dir)
+    assert loaded.nodes == expected.nodes
+    assert loaded.matrices.keys() == expected.matrices.keys()
+
+
+def test_entry_is_not_pickled(tmp_path):
+    graph = make_graph([("x", "a", "y"), ("y", "epsilon", "x"), ("y", 1, "y")])
+    graph.add_edge(0, "x", label="b")
+    decomposition = fa_utils.get_graph_decomposition(graph)
+    path = str(tmp_path / "entry")
+    graph_cache.save_decomposition(path, decomposition)
+    assert sorted(os.listdir(path)) == ["index.json", "indices.npy", "indptr.npy"]
+
+    loaded = graph_cache.load_decomposition(path)
+    assert loaded.nodes == decomposition.nodes
+    assert loaded.nodes_idxs == decomposition.nodes_idxs
+    assert loaded.matrices.keys() == decomposition.matrices.keys()
+
+
+def test_int_nodes_are_memory_mapped(tmp_path):
+    graph = make_graph([(10, "a", 20), (20, "b", 10)])
+    path = str(tmp_path / "entry")
+    graph_cache.save_decomposition(path, fa_utils.get_graph_decomposition(graph))
+    loaded = graph_cache.load_decomposition(path)
+    assert isinstance(loaded.nodes.array, np.memmap)
+    assert loaded.nodes == [10, 20]
+    assert loaded.nodes_idxs[20] == 1
+
+
+def test_graph_with_other_nodes_is_not_cached(tmp_path):
+    graph = make_graph([((0, 1), "a", (1, 0))])
+    expected = fa_utils.get_graph_decomposition(graph)
+    assert not graph_cache.can_save_decomposition(expected)
+    decomposition = fa_utils.get_graph_decomposition(graph, str(tmp_path))
+    assert decomposition.nodes == expected.nodes
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,83 @@
+import networkx as nx
+import numpy as np
+from pyformlang.cfg import CFG
+import pytest
+
+import project.cfpq as cfpq
+import project.finite_automata_utils as fa_utils
+import project.graph_utils as graph_utils
+from project.labeled_graph import LabeledGraph
+
+
+@pytest.fixture
+def nx_graph():
+    graph = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "a"}),
+            (2, 0, {"label": "a"}),
+            (0, 3, {"label": "b"}),
+            (3, 0, {"label": "b"}),
+        ]
+    )
+    graph.add_node(7)
+    return graph
+
+
+def test_save_and_load(nx_graph, tmp_path):
+    path = str(tmp_path / "graph.bin")
+    graph_utils.save_labeled_graph(nx_graph, path)
+    assert graph_utils.is_labeled_graph_file(path)
+
+    loaded = graph_utils.load_labeled_graph(path)
+    original = LabeledGraph.from_networkx(nx_graph)
+    assert loaded.nodes == original.nodes
+    assert loaded.labels == original.labels
+    assert np.array_equal(loaded.label_ptr, original.label_ptr)
+    assert np.array_equal(loaded.src, original.src)
+    assert np.array_equal(loaded.indices, original.indices)
+    assert isinstance(loaded.indices, np.memmap)
+
+
+def test_string_nodes(tmp_path):
+    graph = nx.MultiDiGraph([("x", "y", {"label": "a"})])
+    path = str(tmp_path / "graph.bin")
+    graph_utils.save_labeled_graph(graph, path)
+    assert graph_utils.load_labeled_graph(path).nodes == ["x", "y"]
+
+
+def test_not_a_graph_file(tmp_path):
+    path = tmp_path / "graph.dot"
+    path.write_text("digraph {}")
+    assert not graph_utils.is_labeled_graph_file(str(path))
+    with pytest.raises(ValueError):
+        graph_utils.load_labeled_graph(str(path))
+
+
+def test_entry_points_accept_path(nx_graph, tmp_path):
+    path = str(tmp_path / "graph.bin")
+    graph_utils.save_labeled_graph(nx_graph, path)
+    cfg = CFG.from_text("S -> a S b | a b")
+
+    assert cfpq.matrix(path, cfg) == cfpq.matrix(nx_graph, cfg)
+    assert cfpq.helling(path, cfg) == cfpq.helling(nx_graph, cfg)
+    assert fa_utils.find_reachable_in_graph_from_each(
+        path, "a*b", [0, 1], [3]
+    ) == fa_utils.find_reachable_in_graph_from_each(nx_graph, "a*b", [0, 1], [3])
+
+
+def test_int_nodes_stay_memory_mapped(nx_graph, tmp_path):
+    path = str(tmp_path / "graph.bin")
+    graph_utils.save_labeled_graph(nx_graph, path)
+    loaded = graph_utils.load_labeled_graph(path)
+    assert isinstance(loaded.nodes.array, np.memmap)
+    assert all(type(node) is int for node in loaded.nodes)
+    assert 7 in loaded.nodes and 8 not in loaded.nodes and "7" not in loaded.nodes
+    assert sorted(map(repr, loaded.edges(data="label"))) == sorted(
+        map(repr, nx_graph.edges(data="label"))
+    )
+
+    index = loaded.node_index()
+    assert [index[node] for node in loaded.nodes] == list(range(len(loaded.nodes)))
+    for missing in (8, -1, 2**70, "0", True):
+        assert missing not in index
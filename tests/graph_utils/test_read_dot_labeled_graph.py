@@ -0,0 +1,54 @@
+import networkx as nx
+from pyformlang.cfg import CFG, Variable
+import pytest
+
+import project.cfpq as cfpq
+import project.graph_utils as graph_utils
+
+
+def edges_of(graph):
+    return sorted((str(u), str(v), label) for u, v, label in graph.edges(data="label"))
+
+
+def test_two_cycles_graph(tmp_path):
+    path = str(tmp_path / "graph.dot")
+    graph_utils.save_labeled_two_cycles_graph(2, 3, ("a", "b"), path)
+    graph = graph_utils.read_dot_labeled_graph(path)
+    expected = nx.nx_pydot.read_dot(path)
+
+    assert set(graph.nodes) == set(expected.nodes)
+    assert edges_of(graph) == edges_of(expected)
+
+
+def test_quoted_ids_and_attributes(tmp_path):
+    path = tmp_path / "graph.dot"
+    path.write_text(
+        """strict digraph g {
+rankdir=LR;
+node [shape=circle];
+"x y";
+"x y" -> 1 [key=0, label="a b"];
+1 -> "x y" [label=c];
+1 -> 2;
+}
+"""
+    )
+    graph = graph_utils.read_dot_labeled_graph(str(path))
+    assert graph.nodes == ["x y", "1", "2"]
+    assert edges_of(graph) == [("1", "x y", "c"), ("x y", "1", "a b")]
+
+
+def test_undirected_graph_is_rejected(tmp_path):
+    path = tmp_path / "graph.dot"
+    path.write_text("graph {\n1 -- 2;\n}\n")
+    with pytest.raises(ValueError):
+        graph_utils.read_dot_labeled_graph(str(path))
+
+
+def test_cfpq_accepts_dot_path(tmp_path):
+    path = str(tmp_path / "graph.dot")
+    graph_utils.save_labeled_two_cycles_graph(2, 1, ("a", "b"), path)
+    cfg = CFG.from_text("S -> a S b | a b")
+    expected = cfpq.matrix(nx.nx_pydot.read_dot(path), cfg, variable=Variable("S"))
+    assert cfpq.matrix(path, cfg, variable=Variable("S")) == expected
+    assert ("2", Variable("S"), "3") in expected
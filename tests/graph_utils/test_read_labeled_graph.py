@@ -0,0 +1,58 @@
+import networkx as nx
+import pytest
+
+import project.finite_automata_utils as fa_utils
+import project.graph_utils as graph_utils
+
+
+@pytest.fixture
+def edges_file(tmp_path):
+    path = tmp_path / "graph.csv"
+    path.write_text("0 1 a\n1 2 b\n2 0 a\n10 1 c\n2 0 a\n")
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 100])
+def test_read_by_chunks(edges_file, chunk_size):
+    graph = graph_utils.read_labeled_graph(edges_file, chunk_size=chunk_size)
+    assert graph.nodes == [0, 1, 2, 10]
+    assert graph.labels == ["a", "b", "c"]
+    edges = {
+        (graph.nodes[u], graph.labels[label], graph.nodes[v])
+        for u, v, label in zip(graph.src, graph.dst, graph.label_ids)
+    }
+    assert edges == {(0, "a", 1), (1, "b", 2), (2, "a", 0), (10, "c", 1)}
+
+
+def test_graph_info_from_file(edges_file):
+    expected = (4, 5, {"a", "b", "c"})
+    assert graph_utils.get_graph_info_from_file(edges_file) == expected
+
+
+def test_query_functions_accept_labeled_graph(edges_file):
+    graph = graph_utils.read_labeled_graph(edges_file)
+    nx_graph = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "b"}),
+            (2, 0, {"label": "a"}),
+            (10, 1, {"label": "c"}),
+        ]
+    )
+    assert fa_utils.find_reachable_in_graph_from_each(
+        graph, "(ab)*|cb", [0, 10], [0, 1, 2]
+    ) == fa_utils.find_reachable_in_graph_from_each(
+        nx_graph, "(ab)*|cb", [0, 10], [0, 1, 2]
+    )
+    assert fa_utils.query_regex_to_fa_with_states(
+        graph, "aba"
+    ) == fa_utils.query_regex_to_fa_with_states(nx_graph, "aba")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 100])
+def test_edges_without_label_are_skipped(tmp_path, chunk_size):
+    path = tmp_path / "graph.csv"
+    path.write_text("0 1 a\n1 2\n")
+    graph = graph_utils.read_labeled_graph(str(path), chunk_size=chunk_size)
+    assert graph.nodes == [0, 1, 2]
+    assert list(graph.edges(data="label")) == [(0, 1, "a")]
@@ -0,0 +1,95 @@
+import networkx as nx
+import numpy as np
+from pyformlang.cfg import CFG, Variable
+import pytest
+
+import project.cfpq as cfpq
+import project.finite_automata_utils as fa_utils
+from project.labeled_graph import LabeledGraph
+
+
+@pytest.fixture
+def nx_graph():
+    graph = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "a"}),
+            (2, 0, {"label": "a"}),
+            (0, 3, {"label": "b"}),
+            (3, 0, {"label": "b"}),
+            (3, 0, {"label": "b"}),
+        ]
+    )
+    graph.add_node("isolated")
+    return graph
+
+
+def edges_of(graph):
+    return sorted(map(repr, graph.edges(data="label")))
+
+
+def test_networkx_round_trip(nx_graph):
+    graph = LabeledGraph.from_networkx(nx_graph)
+    assert graph.number_of_nodes() == 5
+    assert graph.number_of_edges() == 6
+    assert graph.unique_labels() == {"a", "b"}
+    back = graph.to_networkx()
+    assert set(back.nodes) == set(nx_graph.nodes)
+    assert edges_of(back) == edges_of(nx_graph)
+
+
+def test_csr_per_label(nx_graph):
+    graph = LabeledGraph.from_networkx(nx_graph)
+    matrices = graph.label_matrices()
+    b = matrices["b"].toarray()
+    assert b.sum() == 2
+    assert b[graph.nodes.index(3), graph.nodes.index(0)]
+    assert np.array_equal(np.diff(graph.label_ptr), [3, 3])
+    assert matrices["a"].indices.base is not None
+
+
+def test_memory_does_not_depend_on_labels_times_nodes():
+    n, n_labels = 10000, 1000
+    graph = LabeledGraph.from_indexed_edges(
+        list(range(n)),
+        [str(i) for i in range(n_labels)],
+        np.array([0, 1]),
+        np.array([1, 2]),
+        np.array([5, 999]),
+    )
+    assert graph.label_ptr.size + graph.src.size + graph.indices.size < n
+    matrices = graph.label_matrices()
+    assert len(matrices) == n_labels
+    assert matrices["999"][1, 2]
+    assert matrices["999"] is matrices["999"]
+
+
+def test_slots(nx_graph):
+    graph = LabeledGraph.from_networkx(nx_graph)
+    with pytest.raises(AttributeError):
+        graph.weights = []
+
+
+def test_cfpq_engines_accept_labeled_graph(nx_graph):
+    cfg = CFG.from_text(
+        """
+    S -> a S b | a b | S S"""
+    )
+    graph = LabeledGraph.from_networkx(nx_graph)
+    expected = cfpq.matrix(nx_graph, cfg)
+    assert cfpq.matrix(graph, cfg) == expected
+    assert cfpq.helling(graph, cfg) == expected
+    assert cfpq.tensor(graph, cfg, variable=Variable("S")) == cfpq.matrix(
+        nx_graph, cfg, variable=Variable("S")
+    )
+
+
+def test_regular_queries_accept_labeled_graph(nx_graph):
+    graph = LabeledGraph.from_networkx(nx_graph)
+    assert fa_utils.query_regex_to_fa_with_states(
+        graph, "a*b"
+    ) == fa_utils.query_regex_to_fa_with_states(nx_graph, "a*b")
+    assert fa_utils.find_reachable_in_graph_from_each(
+        graph, "ab", [0, 2, "isolated"], [3]
+    ) == {0: set(), 2: {3}, "isolated": set()}
+    assert fa_utils.find_reachable_in_graph_from_any(graph, "b", [3], [0]) == {0}
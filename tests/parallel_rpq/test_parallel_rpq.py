@@ -0,0 +1,109 @@
+from multiprocessing.shared_memory import SharedMemory
+import networkx as nx
+import pytest
+
+import project.finite_automata_utils as fa_utils
+import project.parallel_rpq as parallel_rpq
+
+
+@pytest.fixture
+def graph():
+    return nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "b"}),
+            (2, 0, {"label": "a"}),
+            (2, 3, {"label": "c"}),
+            (3, 3, {"label": "c"}),
+            (4, 0, {"label": "b"}),
+        ]
+    )
+
+
+@pytest.mark.parametrize("query", ["ab", "(ab|a)*", "a*c+", "c?"])
+def test_query_same_as_single_process(graph, query):
+    expected = fa_utils.query_regex_to_fa_with_states(
+        graph, query, {0, 1, 4}, {0, 2, 3}
+    )
+    actual = parallel_rpq.query_regex_to_fa_with_states(
+        graph, query, {0, 1, 4}, {0, 2, 3}, processes=2
+    )
+    assert actual == expected
+
+
+@pytest.mark.parametrize("query", ["ab", "(ab|a)*", "a*c+", "c?"])
+def test_from_each_same_as_single_process(graph, query):
+    expected = fa_utils.find_reachable_in_graph_from_each(
+        graph, query, [0, 1, 2, 4], [0, 1, 2, 3]
+    )
+    actual = parallel_rpq.find_reachable_in_graph_from_each(
+        graph, query, [0, 1, 2, 4], [0, 1, 2, 3], processes=2
+    )
+    assert actual == expected
+
+
+def test_executor_answers_many_queries(graph):
+    with parallel_rpq.ParallelRPQExecutor(graph, processes=2) as executor:
+        assert executor.query_regex_with_states("ab", {0}, {2}) == {(0, 2)}
+        assert executor.find_reachable_from_each("c*", [2, 3], [3]) == {
+            2: {3},
+            3: {3},
+        }
+
+
+def test_non_positive_processes(graph):
+    with pytest.raises(ValueError):
+        parallel_rpq.ParallelRPQExecutor(graph, processes=0)
+
+
+def test_no_starts(graph):
+    assert (
+        parallel_rpq.find_reachable_in_graph_from_each(graph, "a", [], [0], processes=2)
+        == dict()
+    )
+    assert (
+        parallel_rpq.query_regex_to_fa_with_states(graph, "a", set(), processes=2)
+        == set()
+    )
+
+
+def test_empty_graph():
+    graph = nx.MultiDiGraph()
+    assert parallel_rpq.query_regex_to_fa_with_states(graph, "a", processes=2) == set()
+    assert fa_utils.query_regex_to_fa_with_states(graph, "a") == set()
+
+
+def test_shared_memory_is_released_if_pool_fails(graph, monkeypatch):
+    shared = []
+    share_matrices = parallel_rpq._share_matrices
+
+    def share_and_remember(matrices, n):
+        memory, layout = share_matrices(matrices, n)
+        shared.append(memory.name)
+        return memory, layout
+
+    def fail(*args, **kwargs):
+        raise OSError("no processes")
+
+    monkeypatch.setattr(parallel_rpq, "_share_matrices", share_and_remember)
+    monkeypatch.setattr(parallel_rpq, "ProcessPoolExecutor", fail)
+    with pytest.raises(OSError):
+        parallel_rpq.ParallelRPQExecutor(graph, processes=2)
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=shared[0])
+
+
+def test_worker_closes_shared_memory(graph):
+    decomposition = fa_utils.get_graph_decomposition(graph)
+    memory, layout = parallel_rpq._share_matrices(
+        decomposition.matrices, len(decomposition.nodes)
+    )
+    try:
+        parallel_rpq._attach_matrices(layout)
+        attached = parallel_rpq._worker_state[0]
+        parallel_rpq._detach_matrices()
+        assert parallel_rpq._worker_state[0] is None
+        assert attached.buf is None
+    finally:
+        memory.close()
+        memory.unlink()
@@ -14,3 +14,18 @@ def test_minimize():
     for var, fa in dfa.fa_dict.items():
         min_fa = fa.minimize()
         assert min_dfa.fa_dict[var] == min_fa
+
+
+def test_minimize_numbers_states_compactly():
+    min_rfa = RFA.from_cfg(default_cfg()).minimize()
+    for var, fa in min_rfa.fa_dict.items():
+        assert {state.value for state in fa.states} == set(range(len(fa.states)))
+        assert len(fa.states) == len(fa.minimize().states)
+
+
+def test_minimize_in_processes():
+    rfa = RFA.from_cfg(default_cfg())
+    expected = rfa.minimize()
+    actual = rfa.minimize(processes=2)
+    for var, fa in expected.fa_dict.items():
+        assert actual.fa_dict[var] == fa
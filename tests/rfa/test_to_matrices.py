@@ -0,0 +1,36 @@
+from pyformlang.cfg import Variable
+from pyformlang.finite_automaton import Symbol
+from project.rfa import RFA
+from tests.ecfg.test_creation import default_cfg
+
+
+def test_to_matrices():
+    rfa = RFA.from_cfg(default_cfg()).minimize()
+    matrices = rfa.to_matrices()
+
+    n = len(matrices.states_idxs)
+    assert n == sum(len(fa.states) for fa in rfa.fa_dict.values())
+    assert matrices.matrices.keys() == {
+        Symbol(s) for s in ["a", "b", "c", "S", "A", "B"]
+    }
+    for matrix in matrices.matrices.values():
+        assert matrix.shape == (n, n)
+
+    for var, fa in rfa.fa_dict.items():
+        assert matrices.start_states[var].sum() == len(fa.start_states)
+        assert matrices.final_states[var].sum() == len(fa.final_states)
+
+    c_matrix = matrices.matrices[Symbol("c")]
+    rows, cols = c_matrix.nonzero()
+    b_states = {
+        i for (var, _), i in matrices.states_idxs.items() if var == Variable("B")
+    }
+    assert set(rows) <= b_states
+    assert set(cols) <= b_states
+    assert matrices.start_states[Variable("B")][rows].all()
+    assert matrices.final_states[Variable("B")][cols].all()
+
+
+def test_to_matrices_is_cached():
+    rfa = RFA.from_cfg(default_cfg())
+    assert rfa.to_matrices() is rfa.to_matrices()
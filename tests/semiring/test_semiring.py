@@ -0,0 +1,100 @@
+import networkx as nx
+import numpy as np
+import pytest
+from pyformlang.cfg import CFG
+from pyformlang.finite_automaton import EpsilonNFA
+
+import project.cfpq as cfpq
+import project.finite_automata_utils as fa_utils
+from project.semiring import (
+    ScipyBooleanSemiring,
+    Semiring,
+    available_backends,
+    get_semiring,
+)
+
+BACKENDS = available_backends()
+
+
+def chain_with_loop():
+    edges = [(0, 1), (1, 2), (2, 3), (3, 1), (0, 3)]
+    rows, cols = map(np.array, zip(*edges))
+    return fa_utils.build_bool_matrix(rows, cols, 4)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_shortest_path_lengths(backend):
+    semiring = get_semiring("tropical", backend)
+    closure = fa_utils.get_transitive_closure(
+        semiring.from_bool(chain_with_loop()), semiring=semiring
+    )
+    lengths = {(i, j): length for i, j, length in zip(*semiring.values(closure))}
+    assert lengths[(0, 3)] == 1
+    assert lengths[(0, 2)] == 2
+    assert lengths[(1, 1)] == 3
+    assert (1, 0) not in lengths
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_start_rows_lengths(backend):
+    semiring = get_semiring("tropical", backend)
+    closure = fa_utils.get_transitive_closure(
+        semiring.from_bool(chain_with_loop()), start_rows=[0], semiring=semiring
+    )
+    lengths = {(i, j): length for i, j, length in zip(*semiring.values(closure))}
+    assert lengths == {(0, 1): 1, (0, 2): 2, (0, 3): 1}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_matrix_with_backend(backend):
+    gr = nx.MultiDiGraph(
+        [
+            (0, 1, {"label": "a"}),
+            (1, 2, {"label": "a"}),
+            (2, 0, {"label": "a"}),
+            (0, 3, {"label": "b"}),
+            (3, 0, {"label": "b"}),
+        ]
+    )
+    cfg = CFG.from_text("S -> a S b | a b | S S | $")
+
+    expected = cfpq.helling(gr, cfg)
+    assert cfpq.matrix(gr, cfg, backend=backend) == expected
+    assert cfpq.matrix(gr, cfg, engine="naive", backend=backend) == expected
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_regex_queries_with_backend(backend):
+    fa = EpsilonNFA()
+    fa.add_transitions([(0, "a", 1), (1, "b", 0), (1, "c", 2), (2, "a", 1)])
+    fa.add_start_state(0)
+    fa.add_final_state(1)
+
+    query = "(ab)*a(ca)*"
+    assert fa_utils.query_regex_to_fa(fa, query, backend=backend) == {(0, 1)}
+    assert fa_utils.find_reachable_in_fa_from_any(fa, query, [0], backend) == {1}
+    assert fa_utils.find_reachable_in_fa_from_each(fa, query, [0, 2], backend) == {
+        0: {1},
+        2: {1},
+    }
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_semiring("boolean", "unknown")
+    with pytest.raises(ValueError):
+        get_semiring("unknown")
+
+
+def test_incomplete_semiring_fails_on_creation():
+    class NoMatmul(Semiring):
+        def from_bool(self, matrix):
+            return matrix
+
+        def selection(self, rows, cols, shape):
+            return ScipyBooleanSemiring().selection(rows, cols, shape)
+
+    with pytest.raises(TypeError):
+        NoMatmul()
+    with pytest.raises(TypeError):
+        Semiring()